@@ -1,190 +1,735 @@
 import heapq
+import multiprocessing as mp
+import os
+import queue
 import time
 import tracemalloc
 from collections import Counter
-from cnf_generator import HashiCNF
+from bucket_queue import BucketQueue
+from cnf_cache import build_cnf
+from cnf_generator import MA_HOA_MAC_DINH
 from hashiwokakero import PuzzleState
+from puzzle_index import splitmix64
 
 
-def kiem_tra_clause(clause, gan):
-    for lit in clause:
-        v = abs(lit)
-        if v in gan:
-            gia_tri = gan[v]
-            if (lit > 0 and gia_tri) or (lit < 0 and not gia_tri):
-                return True
-    return False
+def _cac_bit(x):
+    # vi tri cac bit 1 cua so nguyen x, tu thap den cao
+    while x:
+        thap = x & -x
+        yield thap.bit_length() - 1
+        x ^= thap
 
 
-def dem_chua_thoa(ds_clause, gan):
-    dem = 0
-    for cl in ds_clause:
-        if not kiem_tra_clause(cl, gan):
-            dem += 1
-    return dem
+class WatchedPropagator:
+    # lan truyen don vi bang 2 literal canh (two watched literals).
+    # Moi menh de (>= 2 literal) canh 2 literal dau; khi 1 literal bi sai chi
+    # xet cac menh de dang canh no. Gia tri bien: 1 dung, -1 sai, 0 chua gan.
+    # Quay lui chi xoa gia tri theo trail, ko can sua ds canh.
+    # Song song giu bo dem theo menh de (so literal dung, so literal chua gan)
+    # cap nhat khi gan / bo gan: h = so menh de chua thoa lay O(1), va cac
+    # menh de chua thoa chia ngan theo so literal chua gan de chon bien.
+    # Phep gan hien tai con duoc giu dang 2 bitset (bien da gan, bien = dung)
+    # va dau van tay 64-bit (xor khoa cua cac literal da gan).
 
+    def __init__(self, ds_clause, so_bien):
+        self.ds_clause = ds_clause
+        self.so_bien = so_bien
+        self.gia_tri = [0] * (so_bien + 1)
+        self.trail = []
+        self.dau_hang = 0
+        self.mask_gan = 0
+        self.mask_dung = 0
+        self.van_tay = 0
+        self.khoa = [splitmix64(ma) for ma in range(2 * so_bien + 2)]
+        # ds canh theo ma literal: lit > 0 -> 2*lit, lit < 0 -> 2*(-lit) + 1
+        self.canh = [[] for _ in range(2 * so_bien + 2)]
+        self.don_vi = []
+        self.co_rong = False
 
-def lan_truyen_don_vi(ds_clause, gan):
-    gan_moi = gan.copy()
-    co_thay_doi = True
-    
-    while co_thay_doi:
-        co_thay_doi = False
-        
-        for clause in ds_clause:
-            if kiem_tra_clause(clause, gan_moi):
-                continue
-            
-            chua_gan = []
-            for lit in clause:
-                if abs(lit) not in gan_moi:
-                    chua_gan.append(lit)
-
-            if not chua_gan:
-                return None, True
-
-            if len(chua_gan) == 1:
-                lit = chua_gan[0]
-                bien = abs(lit)
-                can_true = (lit > 0)
-                
-                if bien in gan_moi and gan_moi[bien] != can_true:
-                    return None, True
-                
-                if bien not in gan_moi:
-                    gan_moi[bien] = can_true
-                    co_thay_doi = True
-                    
-    return gan_moi, False
+        # ds xuat hien: ma literal -> id cac menh de chua literal do
+        self.xuat_hien = [[] for _ in range(2 * so_bien + 2)]
+        self.so_dung = [0] * len(ds_clause)
+        self.so_chua_gan = [len(cl) for cl in ds_clause]
+        self.so_chua_thoa = len(ds_clause)
+        do_dai_max = max(self.so_chua_gan, default=0)
+        self.ngan = [set() for _ in range(do_dai_max + 1)]
+        for c, cl in enumerate(ds_clause):
+            self.ngan[len(cl)].add(c)
+            for lit in cl:
+                self.xuat_hien[self._ma(lit)].append(c)
+
+        for cl in ds_clause:
+            if len(cl) == 0:
+                self.co_rong = True
+            elif len(cl) == 1:
+                self.don_vi.append(cl[0])
+            else:
+                # ban sao rieng vi vi tri canh bi doi cho
+                cl = list(cl)
+                self.canh[self._ma(cl[0])].append(cl)
+                self.canh[self._ma(cl[1])].append(cl)
+
+    @staticmethod
+    def _ma(lit):
+        return 2 * lit if lit > 0 else 1 - 2 * lit
+
+    def gia_tri_lit(self, lit):
+        v = self.gia_tri[abs(lit)]
+        return v if lit > 0 else -v
+
+    def khoi_tao(self):
+        # gan cac menh de don vi va lan truyen o muc goc
+        if self.co_rong:
+            return False
+        for lit in self.don_vi:
+            if not self.gan(lit):
+                return False
+        return self.lan_truyen()
+
+    def gan(self, lit):
+        # tra ve False neu lit dang sai
+        v = self.gia_tri_lit(lit)
+        if v != 0:
+            return v > 0
+        self._dat(lit)
+        return True
+
+    def _dat(self, lit):
+        # gan lit = dung, cap nhat bo dem va ngan cua cac menh de lien quan
+        self.gia_tri[abs(lit)] = 1 if lit > 0 else -1
+        self.trail.append(lit)
+        so_dung, so_chua_gan, ngan = self.so_dung, self.so_chua_gan, self.ngan
+        ma = 2 * lit if lit > 0 else 1 - 2 * lit
+        bit = 1 << abs(lit)
+        self.mask_gan ^= bit
+        if lit > 0:
+            self.mask_dung ^= bit
+        self.van_tay ^= self.khoa[ma]
+        ma_nguoc = ma ^ 1
+        for c in self.xuat_hien[ma]:
+            if so_dung[c] == 0:
+                self.so_chua_thoa -= 1
+                ngan[so_chua_gan[c]].discard(c)
+            so_dung[c] += 1
+            so_chua_gan[c] -= 1
+        for c in self.xuat_hien[ma_nguoc]:
+            k = so_chua_gan[c]
+            so_chua_gan[c] = k - 1
+            if so_dung[c] == 0:
+                ngan[k].discard(c)
+                ngan[k - 1].add(c)
+
+    def _bo(self, lit):
+        # nguoc lai cua _dat
+        self.gia_tri[abs(lit)] = 0
+        so_dung, so_chua_gan, ngan = self.so_dung, self.so_chua_gan, self.ngan
+        ma = 2 * lit if lit > 0 else 1 - 2 * lit
+        bit = 1 << abs(lit)
+        self.mask_gan ^= bit
+        if lit > 0:
+            self.mask_dung ^= bit
+        self.van_tay ^= self.khoa[ma]
+        for c in self.xuat_hien[ma ^ 1]:
+            k = so_chua_gan[c]
+            so_chua_gan[c] = k + 1
+            if so_dung[c] == 0:
+                ngan[k].discard(c)
+                ngan[k + 1].add(c)
+        for c in self.xuat_hien[ma]:
+            so_chua_gan[c] += 1
+            so_dung[c] -= 1
+            if so_dung[c] == 0:
+                self.so_chua_thoa += 1
+                ngan[so_chua_gan[c]].add(c)
+
+    def lan_truyen(self):
+        # lan truyen tu dau hang den het trail; False neu xung dot
+        gia_tri = self.gia_tri
+        trail = self.trail
+        canh = self.canh
+        while self.dau_hang < len(trail):
+            sai = -trail[self.dau_hang]
+            self.dau_hang += 1
+            ds = canh[self._ma(sai)]
+            giu = 0
+            i = 0
+            n = len(ds)
+            while i < n:
+                cl = ds[i]
+                i += 1
+                if cl[0] == sai:
+                    cl[0], cl[1] = cl[1], sai
+                # literal canh con lai
+                khac = cl[0]
+                v = gia_tri[abs(khac)]
+                if (v > 0) if khac > 0 else (v < 0):
+                    ds[giu] = cl
+                    giu += 1
+                    continue
+                # tim literal khac ko sai de canh thay
+                for k in range(2, len(cl)):
+                    x = cl[k]
+                    v = gia_tri[abs(x)]
+                    if v == 0 or (v > 0) == (x > 0):
+                        cl[1], cl[k] = x, sai
+                        canh[self._ma(x)].append(cl)
+                        break
+                else:
+                    ds[giu] = cl
+                    giu += 1
+                    v = gia_tri[abs(khac)]
+                    if v != 0:
+                        # ca menh de deu sai -> giu lai phan con lai cua ds
+                        while i < n:
+                            ds[giu] = ds[i]
+                            giu += 1
+                            i += 1
+                        del ds[giu:]
+                        self.dau_hang = len(trail)
+                        return False
+                    self._dat(khac)
+            del ds[giu:]
+        return True
+
+    def undo_to(self, moc):
+        trail = self.trail
+        while len(trail) > moc:
+            self._bo(trail.pop())
+        self.dau_hang = moc
+
+    def nap(self, mask_gan, mask_dung, moc_goc):
+        # chuyen sang phep gan (mask_gan, mask_dung): giu phan dau trail con
+        # dung voi node, bo phan con lai, roi gan cac bien con thieu.
+        # Node da dong voi lan truyen nen lan truyen lai ko sinh them literal,
+        # chi cap nhat ds canh
+        lech = self.mask_gan & (~mask_gan | (self.mask_dung ^ mask_dung))
+        if lech:
+            bien_lech = set(_cac_bit(lech))
+            trail = self.trail
+            i = moc_goc
+            while i < len(trail) and abs(trail[i]) not in bien_lech:
+                i += 1
+            self.undo_to(i)
+        for v in _cac_bit(mask_gan & ~self.mask_gan):
+            self.gan(v if (mask_dung >> v) & 1 else -v)
+        self.lan_truyen()
+
+    def dem_chua_thoa(self):
+        # so menh de chua co literal nao dung
+        return self.so_chua_thoa
+
+    def chon_bien(self):
+        # bien xuat hien nhieu nhat trong cac menh de chua thoa ngan nhat
+        # (ngan nho nhat khac rong, bo qua ngan 0 = menh de da sai het);
+        # duyet theo id menh de de hoa giong thu tu duyet ca CNF
+        gia_tri = self.gia_tri
+        for k in range(1, len(self.ngan)):
+            if self.ngan[k]:
+                break
+        else:
+            return None
+
+        ds_bien_tot = Counter()
+        for c in sorted(self.ngan[k]):
+            for lit in self.ds_clause[c]:
+                if gia_tri[abs(lit)] == 0:
+                    ds_bien_tot[abs(lit)] += 1
+        return ds_bien_tot.most_common(1)[0][0]
 
 
 def tao_state_tu_gan(hc, gan, puzzle):
     state = PuzzleState()
+    # cau da co dinh boi suy luan lay tu hc.co_dinh
+    dem = hc.bridge_counts({v for v, gia_tri in gan.items() if gia_tri})
     
-    for b in hc.bridges:
-        idx = b['idx']
-        var1 = hc.var_pool.get((idx, 1))
-        var2 = hc.var_pool.get((idx, 2))
-        
-        so_cau = 0
-        if var2 is not None and gan.get(var2, False):
-            so_cau = 2
-        elif var1 is not None and gan.get(var1, False):
-            so_cau = 1
-
+    chi_so = hc.index
+    for idx in range(chi_so.num_bridges):
+        so_cau = dem[idx]
         if so_cau > 0:
-            u, v = b['u'], b['v']
-            dao_u = puzzle.island_map[(u['r'], u['c'])]
-            dao_v = puzzle.island_map[(v['r'], v['c'])]
+            dao_u = puzzle.islands[chi_so.bridge_u[idx]]
+            dao_v = puzzle.islands[chi_so.bridge_v[idx]]
             state.add_bridge(dao_u, dao_v, so_cau)
 
     return state
 
 
-def solve_astar(puzzle, gioi_han_tg=60, gioi_han_node=2000000):
-    hc = HashiCNF(puzzle.grid)
-    hc.generate_cnf()
-    ds_clause, so_bien = hc.get_clause_list()
+# che do tim kiem: 'astar' giu moi node sinh ra; 'ida' (IDA*) tang dan nguong
+# f, bo nho tuyen tinh theo do sau; 'sma' (SMA*) gioi han so node luu, quen
+# la te nhat va day f cua no len node cha; 'hda' (HDA*) chia node cho nhieu
+# tien trinh theo dau van tay
+CAC_CHE_DO = ('astar', 'ida', 'sma', 'hda')
+TEN_CHE_DO = {'astar': 'A*', 'ida': 'IDA*', 'sma': 'SMA*', 'hda': 'HDA*'}
+GIOI_HAN_BO_NHO_MAC_DINH = 100000
+# HDA*: so node moi lo gui sang worker khac, va cu sau bao nhieu lan mo rong
+# thi gui ca cac lo chua day (tranh worker khac doi)
+KICH_THUOC_LO = 64
+CHU_KY_GUI = 32
+
+
+def _gan_hien_tai(lt):
+    return {abs(lit): lit > 0 for lit in lt.trail}
 
-    tracemalloc.start()
-    t0 = time.perf_counter()
-    gan_dau, xung_dot = lan_truyen_don_vi(ds_clause, {})
-    if xung_dot:
-        return None, time.perf_counter() - t0, {'status': 'unsat'}
 
-    g0 = len(gan_dau)
-    h0 = dem_chua_thoa(ds_clause, gan_dau)
+def _tim_astar(lt, het_gio, gioi_han_node, gioi_han_bo_nho):
+    # node = (bitset bien da gan, bitset bien = dung); tap da xet chi giu
+    # dau van tay 64-bit cua node. Tap mo la hang doi theo ngan (f, h): cung
+    # (f, h) thi cung g, lay theo thu tu vao nhu heap (f, h, g, id) truoc day
+    moc_goc = len(lt.trail)
+    g0 = len(lt.trail)
+    h0 = lt.dem_chua_thoa()
     
-    unique_id = 0
-    heap = []
-    heapq.heappush(heap, (g0 + h0, h0, g0, unique_id, gan_dau))
+    mo = BucketQueue()
+    mo.push(g0 + h0, h0, lt.mask_gan, lt.mask_dung)
     
     da_xet = set()
-    key_dau = tuple(sorted(gan_dau.items()))
-    da_xet.add(key_dau)
+    da_xet.add(lt.van_tay)
 
+    thong_ke = {'nodes_expanded': 0, 'max_open_size': 1}
     so_node = 0
-    max_heap = 1
+    max_mo = 1
 
-    while heap:
-        if (time.perf_counter() - t0) > gioi_han_tg:
+    while mo:
+        if het_gio():
             break
 
-        f, h, g, _, gan_ht = heapq.heappop(heap)
+        f, h, (mask_gan, mask_dung) = mo.pop()
 
-        max_heap = max(max_heap, len(heap))
+        max_mo = max(max_mo, len(mo))
         
         so_node += 1
         if so_node > gioi_han_node:
             break
 
-        if h == 0 and dem_chua_thoa(ds_clause, gan_ht) == 0:
-            cur_mem, peak_mem = tracemalloc.get_traced_memory()
-            tracemalloc.stop()
-            tg_chay = time.perf_counter() - t0
-            
-            thong_ke = {
-                'nodes_expanded': so_node,
-                'max_open_size': max_heap,
-                'peak_memory_bytes': peak_mem,
-                'num_vars': so_bien,
-                'algorithm': 'A*'
-            }
-            
-            state = tao_state_tu_gan(hc, gan_ht, puzzle)
-            return state, tg_chay, thong_ke
-
-        do_dai_min = float('inf')
-        ds_bien_tot = Counter()
-        
-        co_chua_thoa = False
-        for cl in ds_clause:
-            if kiem_tra_clause(cl, gan_ht):
+        thong_ke['nodes_expanded'] = so_node
+        thong_ke['max_open_size'] = max_mo
+        if h == 0:
+            return {v: bool((mask_dung >> v) & 1) for v in _cac_bit(mask_gan)}, thong_ke
+
+        lt.nap(mask_gan, mask_dung, moc_goc)
+
+        bien_tiep = lt.chon_bien()
+        if bien_tiep is None:
+            continue
+
+        moc = len(lt.trail)
+        for lit in (bien_tiep, -bien_tiep):
+            lt.gan(lit)
+            ok = lt.lan_truyen()
+            if ok and lt.van_tay not in da_xet:
+                da_xet.add(lt.van_tay)
+                g_moi = len(lt.trail)
+                h_moi = lt.dem_chua_thoa()
+                mo.push(g_moi + h_moi, h_moi, lt.mask_gan, lt.mask_dung)
+            lt.undo_to(moc)
+
+    thong_ke['nodes_expanded'] = so_node
+    thong_ke['max_open_size'] = max_mo
+    return None, thong_ke
+
+
+def _tim_ida(lt, het_gio, gioi_han_node, gioi_han_bo_nho):
+    # DFS tren chinh bo lan truyen (gan / quay lui theo trail), cat nhanh co
+    # f > nguong; het vong thi nang nguong len f nho nhat bi cat.
+    # Re nhanh theo 1 bien la phan hoach nen ko can tap da xet.
+    # Node co f <= nguong vong truoc la node mo rong lai.
+    moc_goc = len(lt.trail)
+    nguong = len(lt.trail) + lt.dem_chua_thoa()
+    nguong_truoc = -1
+    thong_ke = {'nodes_expanded': 0, 'reexpansions': 0, 'max_open_size': 1, 'iterations': 0}
+
+    while True:
+        thong_ke['iterations'] += 1
+        f_vuot = float('inf')
+        lt.undo_to(moc_goc)
+
+        if lt.dem_chua_thoa() == 0:
+            return _gan_hien_tai(lt), thong_ke
+        thong_ke['nodes_expanded'] += 1
+        if nguong_truoc >= 0:
+            thong_ke['reexpansions'] += 1
+        bien = lt.chon_bien()
+        if bien is None:
+            return None, thong_ke
+        # moi khung: [moc trail cua node, cac literal re nhanh con lai]
+        stack = [[moc_goc, [-bien, bien]]]
+
+        while stack:
+            if het_gio() or thong_ke['nodes_expanded'] >= gioi_han_node:
+                lt.undo_to(moc_goc)
+                return None, thong_ke
+            khung = stack[-1]
+            if not khung[1]:
+                stack.pop()
                 continue
-            
-            co_chua_thoa = True
-            chua_gan = [abs(lit) for lit in cl if abs(lit) not in gan_ht]
-            
-            if not chua_gan:
+
+            lt.undo_to(khung[0])
+            lt.gan(khung[1].pop())
+            if not lt.lan_truyen():
                 continue
-            
-            do_dai = len(chua_gan)
-            if do_dai < do_dai_min:
-                do_dai_min = do_dai
-                ds_bien_tot = Counter()
-            
-            if do_dai == do_dai_min:
-                for v in chua_gan:
-                    ds_bien_tot[v] += 1
-        
-        if not co_chua_thoa or not ds_bien_tot:
+            h = lt.dem_chua_thoa()
+            f = len(lt.trail) + h
+            if f > nguong:
+                f_vuot = min(f_vuot, f)
+                continue
+            if h == 0:
+                return _gan_hien_tai(lt), thong_ke
+
+            thong_ke['nodes_expanded'] += 1
+            if f <= nguong_truoc:
+                thong_ke['reexpansions'] += 1
+            bien = lt.chon_bien()
+            if bien is None:
+                continue
+            stack.append([len(lt.trail), [-bien, bien]])
+            thong_ke['max_open_size'] = max(thong_ke['max_open_size'], len(stack))
+
+        if f_vuot == float('inf'):
+            lt.undo_to(moc_goc)
+            return None, thong_ke
+        nguong_truoc, nguong = nguong, f_vuot
+
+
+def _tim_sma(lt, het_gio, gioi_han_node, gioi_han_bo_nho):
+    # SMA* (dang don gian): luu toi da gioi_han_bo_nho node. Khi vuot, quen la
+    # te nhat (f lon nhat, nong nhat) trong tap mo va ghi f cua no vao node cha;
+    # cha mat het con thi quay lai tap mo voi f = min f cac con da quen, lan
+    # mo rong sau sinh lai cac con (tinh la mo rong lai).
+    # node: [mask_gan, mask_dung, f, g, h, cha, so con dang luu, f con da quen,
+    #        da mo rong chua]
+    moc_goc = len(lt.trail)
+    vo_cuc = float('inf')
+    bang = {}
+    mo = set()
+    heap_min = []
+    heap_max = []
+    dem_id = [0]
+    thong_ke = {'nodes_expanded': 0, 'reexpansions': 0, 'max_open_size': 1, 'forgotten': 0}
+
+    def them(f, g, h, cha):
+        i = dem_id[0]
+        dem_id[0] += 1
+        bang[i] = [lt.mask_gan, lt.mask_dung, f, g, h, cha, 0, vo_cuc, False]
+        vao_mo(i)
+        return i
+
+    def vao_mo(i):
+        nut = bang[i]
+        mo.add(i)
+        heapq.heappush(heap_min, (nut[2], nut[4], nut[3], i))
+        heapq.heappush(heap_max, (-nut[2], nut[3], i))
+
+    def mat_con(cha, f_con):
+        # 1 con cua cha bi quen (f_con) hoac chet (vo_cuc)
+        while cha is not None:
+            nut = bang[cha]
+            nut[7] = min(nut[7], f_con)
+            nut[6] -= 1
+            if nut[6] > 0:
+                return
+            if nut[7] < vo_cuc:
+                # het con trong bo nho -> quay lai tap mo voi f da day len
+                nut[2] = max(nut[2], nut[7])
+                nut[7] = vo_cuc
+                vao_mo(cha)
+                return
+            # moi con deu chet -> cha cung chet
+            del bang[cha]
+            cha, f_con = nut[5], vo_cuc
+
+    g0 = len(lt.trail)
+    h0 = lt.dem_chua_thoa()
+    them(g0 + h0, g0, h0, None)
+
+    while mo:
+        if het_gio() or thong_ke['nodes_expanded'] >= gioi_han_node:
+            break
+
+        f, h, g, i = heapq.heappop(heap_min)
+        nut = bang.get(i)
+        if i not in mo or nut is None or nut[2] != f:
             continue
+        mo.discard(i)
+
+        thong_ke['nodes_expanded'] += 1
+        if nut[8]:
+            thong_ke['reexpansions'] += 1
+        nut[8] = True
 
-        bien_tiep = ds_bien_tot.most_common(1)[0][0]
+        lt.nap(nut[0], nut[1], moc_goc)
+        if h == 0:
+            return _gan_hien_tai(lt), thong_ke
 
-        for gia_tri in [True, False]:
-            gan_moi = gan_ht.copy()
-            gan_moi[bien_tiep] = gia_tri
-            
-            gan_sau, xung_dot = lan_truyen_don_vi(ds_clause, gan_moi)
-            
-            if xung_dot:
+        bien = lt.chon_bien()
+        so_con = 0
+        if bien is not None:
+            moc = len(lt.trail)
+            for lit in (bien, -bien):
+                lt.gan(lit)
+                if lt.lan_truyen():
+                    g_moi = len(lt.trail)
+                    h_moi = lt.dem_chua_thoa()
+                    # path-max: f cua con ko nho hon f cua cha
+                    them(max(g_moi + h_moi, nut[2]), g_moi, h_moi, i)
+                    so_con += 1
+                lt.undo_to(moc)
+        nut[6] = so_con
+        if so_con == 0:
+            del bang[i]
+            mat_con(nut[5], vo_cuc)
+
+        # vuot gioi han bo nho -> quen la te nhat trong tap mo
+        while len(bang) > gioi_han_bo_nho and len(mo) > 1:
+            _, _, j = heapq.heappop(heap_max)
+            la = bang.get(j)
+            if j not in mo or la is None or la[5] is None:
                 continue
-            
-            key_sau = tuple(sorted(gan_sau.items()))
-            if key_sau in da_xet:
+            mo.discard(j)
+            del bang[j]
+            thong_ke['forgotten'] += 1
+            mat_con(la[5], la[2])
+
+        if len(heap_min) + len(heap_max) > 4 * len(mo) + 64:
+            # bo cac muc cu (da mo rong / da quen) de heap cung nam trong gioi han
+            heap_min[:] = [(bang[j][2], bang[j][4], bang[j][3], j) for j in mo]
+            heap_max[:] = [(-bang[j][2], bang[j][3], j) for j in mo]
+            heapq.heapify(heap_min)
+            heapq.heapify(heap_max)
+
+        thong_ke['max_open_size'] = max(thong_ke['max_open_size'], len(bang))
+
+    return None, thong_ke
+
+
+def _hda_worker(so, so_worker, ds_clause, so_bien, hop_thu, ket_qua, chung):
+    # worker so: so huu cac node co van_tay % so_worker == so, giu tap mo /
+    # tap da xet rieng. Con sinh ra gom theo worker chu roi gui theo lo.
+    # chung = (dem_gui, dem_nhan, ranh, dung, f_tot, dem_node, max_mo):
+    # bo dem tong so node gui / nhan va co ranh dung de phat hien ket thuc
+    dem_gui, dem_nhan, ranh, dung, f_tot, dem_node, max_mo = chung
+    # tien trinh con (fork) ko can theo doi bo nho cua cha
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    lt = WatchedPropagator(ds_clause, so_bien)
+    lt.khoi_tao()
+    moc_goc = len(lt.trail)
+
+    mo = BucketQueue()
+    da_xet = set()
+    hop_ra = [[] for _ in range(so_worker)]
+    dem = [0]  # so node da mo rong
+
+    def gui(dich):
+        # tang bo dem truoc khi dua vao hang doi de ko lot node dang di
+        lo = hop_ra[dich]
+        hop_ra[dich] = []
+        dem_gui[so] += len(lo)
+        hop_thu[dich].put(lo)
+
+    def gui_het():
+        for dich in range(so_worker):
+            if hop_ra[dich]:
+                gui(dich)
+
+    def nhan(lo):
+        for f, h, g, van_tay, mask_gan, mask_dung in lo:
+            if van_tay in da_xet or f >= f_tot.value:
                 continue
-            
-            da_xet.add(key_sau)
-            
-            g_moi = len(gan_sau)
-            h_moi = dem_chua_thoa(ds_clause, gan_sau)
-            
-            unique_id += 1
-            heapq.heappush(heap, (g_moi + h_moi, h_moi, g_moi, unique_id, gan_sau))
+            da_xet.add(van_tay)
+            mo.push(f, h, mask_gan, mask_dung)
 
-    tracemalloc.stop()
-    return None, time.perf_counter() - t0, {
-        'nodes_expanded': so_node, 
-        'max_open_size': max_heap
+    def doc_thu(cho):
+        try:
+            lo = hop_thu[so].get(timeout=cho) if cho else hop_thu[so].get_nowait()
+        except queue.Empty:
+            return False
+        # bo co ranh truoc khi tang dem nhan (xem _tim_hda)
+        ranh[so] = 0
+        dem_nhan[so] += len(lo)
+        nhan(lo)
+        return True
+
+    try:
+        while not dung.value:
+            while doc_thu(0):
+                pass
+            dau = mo.peek()
+            if dau is None or dau[0] >= f_tot.value:
+                # ko con node co the tot hon loi giai da co -> ranh, cho thu
+                gui_het()
+                ranh[so] = 1
+                doc_thu(0.01)
+                continue
+
+            max_mo[so] = max(max_mo[so], len(mo))
+            f, h, (mask_gan, mask_dung) = mo.pop()
+            dem[0] += 1
+            dem_node[so] = dem[0]
+            if h == 0:
+                with f_tot.get_lock():
+                    if f < f_tot.value:
+                        f_tot.value = f
+                        ket_qua.put((f, mask_gan, mask_dung))
+                continue
+
+            lt.nap(mask_gan, mask_dung, moc_goc)
+            bien_tiep = lt.chon_bien()
+            if bien_tiep is not None:
+                moc = len(lt.trail)
+                for lit in (bien_tiep, -bien_tiep):
+                    lt.gan(lit)
+                    if lt.lan_truyen():
+                        g_moi = len(lt.trail)
+                        h_moi = lt.dem_chua_thoa()
+                        if g_moi + h_moi < f_tot.value:
+                            node = (g_moi + h_moi, h_moi, g_moi, lt.van_tay, lt.mask_gan, lt.mask_dung)
+                            dich = lt.van_tay % so_worker
+                            if dich == so:
+                                nhan([node])
+                            else:
+                                hop_ra[dich].append(node)
+                                if len(hop_ra[dich]) >= KICH_THUOC_LO:
+                                    gui(dich)
+                    lt.undo_to(moc)
+            if dem[0] % CHU_KY_GUI == 0:
+                gui_het()
+    finally:
+        # node con ket trong hang doi ko con can; ket_qua van duoc day het
+        for q in hop_thu:
+            q.cancel_join_thread()
+
+
+def _tim_hda(lt, het_gio, gioi_han_node, so_worker):
+    # HDA*: moi worker la 1 A* rieng tren phan node cua minh. Co loi giai f
+    # thi ghi vao f_tot (chung), cac worker bo node co f >= f_tot va chay tiep
+    # den khi moi tap mo ko con node f < f_tot: loi giai la toi uu theo f.
+    # Ket thuc khi moi worker ranh va tong gui == tong nhan, doc 2 lan lien
+    # tiep ko doi (ko co node dang tren duong di)
+    so_worker = max(1, so_worker or os.cpu_count() or 1)
+    vo_cuc = float('inf')
+    dem_gui = mp.Array('q', so_worker, lock=False)
+    dem_nhan = mp.Array('q', so_worker, lock=False)
+    ranh = mp.Array('b', so_worker, lock=False)
+    dem_node = mp.Array('q', so_worker, lock=False)
+    max_mo = mp.Array('q', so_worker, lock=False)
+    dung = mp.Value('b', 0, lock=False)
+    f_tot = mp.Value('d', vo_cuc)
+    hop_thu = [mp.Queue() for _ in range(so_worker)]
+    ket_qua = mp.Queue()
+    chung = (dem_gui, dem_nhan, ranh, dung, f_tot, dem_node, max_mo)
+
+    # node goc gui cho worker chu truoc khi khoi dong
+    g0 = len(lt.trail)
+    h0 = lt.dem_chua_thoa()
+    dich = lt.van_tay % so_worker
+    dem_gui[dich] += 1
+    hop_thu[dich].put([(g0 + h0, h0, g0, lt.van_tay, lt.mask_gan, lt.mask_dung)])
+
+    ds_tien_trinh = [mp.Process(target=_hda_worker,
+                                args=(i, so_worker, lt.ds_clause, lt.so_bien, hop_thu, ket_qua, chung),
+                                daemon=True)
+                     for i in range(so_worker)]
+    for p in ds_tien_trinh:
+        p.start()
+
+    tot = None
+    ket_thuc = False
+
+    def doc_ket_qua(cho):
+        nonlocal tot
+        try:
+            kq = ket_qua.get(timeout=cho)
+        except queue.Empty:
+            return False
+        if tot is None or kq[0] < tot[0]:
+            tot = kq
+        return True
+
+    truoc = None
+    try:
+        while True:
+            if het_gio() or sum(dem_node) >= gioi_han_node:
+                break
+            if doc_ket_qua(0.005):
+                continue
+            if not all(ds_tien_trinh[i].is_alive() for i in range(so_worker)):
+                break
+            # doc dem -> co ranh -> dem lan nua; 2 lan giong nhau va can bang
+            dem1 = (sum(dem_gui), sum(dem_nhan))
+            tat_ca_ranh = all(ranh)
+            dem2 = (sum(dem_gui), sum(dem_nhan))
+            if tat_ca_ranh and dem1 == dem2 and dem1[0] == dem1[1]:
+                if truoc == dem1:
+                    ket_thuc = True
+                    break
+                truoc = dem1
+            else:
+                truoc = None
+    finally:
+        dung.value = 1
+        # lay not loi giai con tren hang doi roi cho worker thoat
+        han = time.perf_counter() + 1.0
+        while any(p.is_alive() for p in ds_tien_trinh) and time.perf_counter() < han:
+            doc_ket_qua(0.01)
+        while doc_ket_qua(0):
+            pass
+        for p in ds_tien_trinh:
+            if p.is_alive():
+                p.kill()
+            p.join()
+        for q in hop_thu:
+            q.cancel_join_thread()
+            q.close()
+
+    thong_ke = {
+        'nodes_expanded': sum(dem_node),
+        'max_open_size': sum(max_mo),
+        'workers': so_worker,
+        'nodes_per_worker': list(dem_node),
+        'messages': sum(dem_gui),
+        'optimal': ket_thuc,
     }
+    if tot is None:
+        return None, thong_ke
+    _, mask_gan, mask_dung = tot
+    return {v: bool((mask_dung >> v) & 1) for v in _cac_bit(mask_gan)}, thong_ke
+
+
+def solve_astar(puzzle, gioi_han_tg=60, gioi_han_node=2000000, cache=None,
+                encoding=MA_HOA_MAC_DINH, deduction=True, mode='astar',
+                gioi_han_bo_nho=GIOI_HAN_BO_NHO_MAC_DINH, so_worker=None):
+    if mode not in CAC_CHE_DO:
+        raise ValueError("mode phai la mot trong %s" % (CAC_CHE_DO,))
+    # deduction: bat dau tu bai toan da rut gon (cau suy ra duoc da co dinh)
+    hc = build_cnf(puzzle, cache, encoding, deduction)
+    ds_clause, so_bien = hc.get_clause_list()
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    # dung 1 bo lan truyen cho moi node: nap node (tap literal da lan truyen),
+    # gan bien re nhanh, lan truyen, roi quay lui ve node
+    lt = WatchedPropagator(ds_clause, so_bien)
+    if not lt.khoi_tao():
+        tracemalloc.stop()
+        return None, time.perf_counter() - t0, {'status': 'unsat'}
+
+    het_gio = lambda: time.perf_counter() - t0 > gioi_han_tg
+    if mode == 'hda':
+        # so_worker = None -> moi core 1 worker
+        gan, thong_ke = _tim_hda(lt, het_gio, gioi_han_node, so_worker)
+    else:
+        tim = {'astar': _tim_astar, 'ida': _tim_ida, 'sma': _tim_sma}[mode]
+        gan, thong_ke = tim(lt, het_gio, gioi_han_node, gioi_han_bo_nho)
+
+    cur_mem, peak_mem = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    tg_chay = time.perf_counter() - t0
+    if gan is None:
+        return None, tg_chay, thong_ke
+
+    thong_ke.update({
+        'peak_memory_bytes': peak_mem,
+        'num_vars': so_bien,
+        'algorithm': TEN_CHE_DO[mode]
+    })
+    state = tao_state_tu_gan(hc, gan, puzzle)
+    return state, tg_chay, thong_ke
@@ -1,4 +1,4 @@
-from hashiwokakero import Puzzle, PuzzleState, Island
+from hashiwokakero import Puzzle, TrailState
 import time
 
 
@@ -22,13 +22,14 @@ class BacktrackingSolver:
         self._start_time = t1
         self.timed_out = False
         
-        # lay danh sach cac cap dao co the noi
-        ds_cau = self.puzzle.get_possible_bridges()
+        # lay danh sach id cac cau co the noi
+        ds_cau = list(range(self.puzzle.index.num_bridges))
         
         # sap xep de duyet dao it lua chon truoc (toi uu)
         ds_cau = self._sap_xep_cau(ds_cau)
         
-        state = PuzzleState()
+        # trang thai mang, sua tai cho bang apply/undo thay vi copy
+        state = TrailState(self.puzzle.index)
         self._quay_lui(state, ds_cau, 0)
         
         self.tg_chay = time.time() - t1
@@ -36,14 +37,12 @@ class BacktrackingSolver:
     
     def _sap_xep_cau(self, ds_cau):
         # tinh so lua chon cua moi dao
-        dem = {}
-        for d in self.puzzle.islands:
-            dem[d] = len(self.puzzle.neighbors[d])
+        idx = self.puzzle.index
+        ke = idx.incident
         
         # sap xep: uu tien cap dao ma ca 2 deu co it lua chon
-        def tinh_diem(cap):
-            d1, d2 = cap
-            return dem[d1] + dem[d2]
+        def tinh_diem(b):
+            return len(ke[idx.bridge_u[b]]) + len(ke[idx.bridge_v[b]])
         
         return sorted(ds_cau, key=tinh_diem)
     
@@ -67,55 +66,63 @@ class BacktrackingSolver:
         
         # het cau de duyet -> kiem tra loi giai
         if vi_tri >= len(ds_cau):
-            if self.puzzle.is_solution(state):
-                self.loi_giai = state.copy()
+            loi_giai = state.to_puzzle_state(self.puzzle)
+            if self.puzzle.is_solution(loi_giai):
+                self.loi_giai = loi_giai
                 return True
             self.dem_quay_lui += 1
             return False
         
-        dao1, dao2 = ds_cau[vi_tri]
+        b = ds_cau[vi_tri]
         
         # thu 0, 1, 2 cau cho cap nay
         for so_cau in [0, 1, 2]:
+            if so_cau == 0:
+                if self._quay_lui(state, ds_cau, vi_tri + 1):
+                    return True
+                continue
+            
             # kiem tra co the them so cau nay khong
-            if so_cau > 0 and not self._co_the_them(state, dao1, dao2, so_cau):
+            if not self._co_the_them(state, b, so_cau):
                 continue
             
             # kiem tra cat nhau
-            if so_cau > 0 and self._bi_cat(state, dao1, dao2):
+            if self._bi_cat(state, b):
                 continue
             
-            # tao state moi va tiep tuc
-            st_moi = state.copy()
-            if so_cau > 0:
-                st_moi.bridges[(dao1, dao2)] = so_cau
-            
-            if self._quay_lui(st_moi, ds_cau, vi_tri + 1):
+            # dat cau tai cho, thu tiep roi go lai
+            state.apply(b, so_cau)
+            if self._quay_lui(state, ds_cau, vi_tri + 1):
                 return True
+            state.undo()
         
         self.dem_quay_lui += 1
         return False
     
     def _kha_thi(self, state):
         # kiem tra moi dao co the dat yeu cau khong
-        for dao in self.puzzle.islands:
-            hien_tai = state.get_total_bridges(dao, self.puzzle.neighbors[dao])
+        idx = self.puzzle.index
+        gia_tri = idx.island_value
+        bac = state.degree
+        dem = state.counts
+        
+        for dao in range(idx.num_islands):
+            hien_tai = bac[dao]
             
             # qua so cau yeu cau
-            if hien_tai > dao.value:
+            if hien_tai > gia_tri[dao]:
                 return False
             
-            con_thieu = dao.value - hien_tai
+            con_thieu = gia_tri[dao] - hien_tai
             
             # dem so cau con co the them
             co_the_them = 0
-            for nb in self.puzzle.neighbors[dao]:
-                da_co = state.get_bridge_count(dao, nb)
-                con_cho = 2 - da_co
+            for b in idx.incident[dao]:
+                con_cho = 2 - dem[b]
                 
                 # kiem tra dao ke con cho bao nhieu
-                nb_hien = state.get_total_bridges(nb, self.puzzle.neighbors[nb])
-                nb_con = nb.value - nb_hien
+                nb = idx.other_end(b, dao)
+                nb_con = gia_tri[nb] - bac[nb]
                 
                 them = min(con_cho, nb_con)
                 if them > 0:
@@ -127,19 +134,19 @@ class BacktrackingSolver:
         
         return True
     
-    def _co_the_them(self, state, d1, d2, so_cau):
+    def _co_the_them(self, state, b, so_cau):
         # kiem tra 2 dao con cho phep them so_cau cau nua khong
-        c1 = state.get_total_bridges(d1, self.puzzle.neighbors[d1])
-        c2 = state.get_total_bridges(d2, self.puzzle.neighbors[d2])
+        idx = self.puzzle.index
+        u, v = idx.bridge_u[b], idx.bridge_v[b]
         
-        return (c1 + so_cau <= d1.value) and (c2 + so_cau <= d2.value)
+        return (state.degree[u] + so_cau <= idx.island_value[u]) and \
+               (state.degree[v] + so_cau <= idx.island_value[v])
     
-    def _bi_cat(self, state, d1, d2):
-        # kiem tra cau moi co cat cau nao da co khong
-        for key, cnt in state.bridges.items():
-            if cnt > 0:
-                if self.puzzle.bridges_cross(d1, d2, key[0], key[1]):
-                    return True
+    def _bi_cat(self, state, b):
+        # kiem tra cau moi co cat cau nao da co khong (chi xet cac cau giao voi no)
+        for x in self.puzzle.index.conflicts[b]:
+            if state.counts[x] > 0:
+                return True
         return False
     
     def get_stats(self):
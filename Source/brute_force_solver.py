@@ -44,7 +44,7 @@ class BruteForceSolver:
                 so_cau = to_hop[i]
                 if so_cau > 0:
                     d1, d2 = ds_cau[i]
-                    state.bridges[(d1, d2)] = so_cau
+                    state.add_bridge(d1, d2, so_cau)
             
             # kiem tra xem co phai loi giai khong
             if self.puzzle.is_solution(state):
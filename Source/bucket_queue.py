@@ -0,0 +1,76 @@
+from collections import deque
+
+
+# hang doi uu tien cho khoa nguyen nho (f, h), thay heapq trong A*:
+# ngan[f][h] la 1 deque, cung (f, h) thi lay theo thu tu vao (FIFO, giong
+# heap voi id tang dan). Con tro f_nho / h_nho[f] chi lui khi push khoa nho
+# hon, pop tien con tro qua cac ngan rong -> push / pop O(1) khau hao, ko so
+# sanh tuple.
+# Moi muc la tuple cac tham so sau f, h cua push (co the rong).
+
+
+class BucketQueue:
+
+    def __init__(self):
+        self.ngan = []
+        self.h_nho = []
+        # so muc dang nam trong moi ngan f
+        self.dem_f = []
+        self.f_nho = 0
+        self.so_muc = 0
+
+    def __len__(self):
+        return self.so_muc
+
+    def push(self, f, h, *du_lieu):
+        ngan = self.ngan
+        if f >= len(ngan):
+            them = f + 1 - len(ngan)
+            ngan.extend([] for _ in range(them))
+            self.h_nho.extend([0] * them)
+            self.dem_f.extend([0] * them)
+        hang = ngan[f]
+        if h >= len(hang):
+            hang.extend(None for _ in range(h + 1 - len(hang)))
+        o = hang[h]
+        if o is None:
+            o = hang[h] = deque()
+
+        o.append(du_lieu)
+        self.dem_f[f] += 1
+        self.so_muc += 1
+        if f < self.f_nho:
+            self.f_nho = f
+        if h < self.h_nho[f]:
+            self.h_nho[f] = h
+
+    def _tien(self):
+        # dua con tro toi ngan khac rong nho nhat, tra ve (f, h, deque) hoac None
+        if not self.so_muc:
+            return None
+        ngan, dem_f, h_nho = self.ngan, self.dem_f, self.h_nho
+        f = self.f_nho
+        while dem_f[f] == 0:
+            f += 1
+        self.f_nho = f
+        hang = ngan[f]
+        h = h_nho[f]
+        while not hang[h]:
+            h += 1
+        h_nho[f] = h
+        return f, h, hang[h]
+
+    def peek(self):
+        # (f, h) nho nhat dang co, None neu rong
+        vi_tri = self._tien()
+        return None if vi_tri is None else vi_tri[:2]
+
+    def pop(self):
+        # tra ve (f, h, du lieu da push)
+        vi_tri = self._tien()
+        if vi_tri is None:
+            raise IndexError("pop tu hang doi rong")
+        f, h, o = vi_tri
+        self.dem_f[f] -= 1
+        self.so_muc -= 1
+        return f, h, o.popleft()
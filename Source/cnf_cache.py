@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import struct
+from array import array
+from itertools import accumulate
+
+from cnf_generator import HashiCNF, ENCODING_VERSION, MA_HOA_MAC_DINH
+from deduction import deduce
+
+# cache CNF tren dia, khoa theo noi dung puzzle (vi tri + gia tri dao) va
+# phien ban + kieu ma hoa. Moi muc la 1 file nhi phan:
+#   header: magic, version, nv, so menh de, tong so literal, so cau, do dai bao cao,
+#   sha256 cua phan than (cac mang + bao cao) de phat hien file hong
+#   roi cac mang int32: do dai menh de, literal, bien1, bien2, bridge_u, bridge_v,
+#   lo, hi (khoang so cau sau suy luan)
+#   cuoi cung la bao cao so bien/menh de theo nhom (JSON)
+MAGIC = b'HCNF'
+VERSION = 4
+_HEADER = struct.Struct('<4sHIIIII32s')
+DUOI_FILE = '.hcnf'
+
+# thu muc cache mac dinh lay tu bien moi truong (neu co)
+BIEN_MOI_TRUONG = 'HASHI_CNF_CACHE'
+MAX_BYTES_MAC_DINH = 256 * 1024 * 1024
+
+_cache_mac_dinh = None
+
+
+def _mang(kieu, du_lieu):
+    a = array(kieu)
+    a.frombytes(du_lieu)
+    return a
+
+
+class CNFCache:
+
+    def __init__(self, thu_muc, max_bytes=MAX_BYTES_MAC_DINH):
+        self.thu_muc = thu_muc
+        self.max_bytes = max_bytes
+        self.so_lan_trung = 0
+        self.so_lan_truot = 0
+        os.makedirs(thu_muc, exist_ok=True)
+
+    def key(self, index, encoding=MA_HOA_MAC_DINH, deduction=True):
+        # bam noi dung puzzle (kich thuoc + bang dao) cung phien ban, kieu ma hoa
+        # va co suy luan truoc hay khong
+        h = hashlib.sha256()
+        h.update(('%d:%s:%d' % (ENCODING_VERSION, encoding, deduction)).encode('utf-8'))
+        h.update(struct.pack('<II', index.rows, index.cols))
+        h.update(index.island_row.tobytes())
+        h.update(index.island_col.tobytes())
+        h.update(index.island_value.tobytes())
+        return h.hexdigest()
+
+    def _duong_dan(self, khoa):
+        return os.path.join(self.thu_muc, khoa + DUOI_FILE)
+
+    def get(self, puzzle, encoding=MA_HOA_MAC_DINH, deduction=True):
+        # tra ve HashiCNF da co CNF neu trung cache, nguoc lai None
+        duong_dan = self._duong_dan(self.key(puzzle.index, encoding, deduction))
+        try:
+            with open(duong_dan, 'rb') as f:
+                du_lieu = f.read()
+        except OSError:
+            self.so_lan_truot += 1
+            return None
+
+        hashi = self._giai_nen(du_lieu, puzzle, encoding)
+        if hashi is None:
+            # file hong hoac ko khop bang cau -> bo di
+            self._xoa(duong_dan)
+            self.so_lan_truot += 1
+            return None
+
+        # danh dau vua dung (LRU theo mtime)
+        try:
+            os.utime(duong_dan)
+        except OSError:
+            pass
+        self.so_lan_trung += 1
+        return hashi
+
+    def put(self, puzzle, hashi):
+        duong_dan = self._duong_dan(self.key(puzzle.index, hashi.encoding, hashi.bounds is not None))
+        tam = duong_dan + '.tmp%d' % os.getpid()
+        du_lieu = self._nen(hashi)
+        # cache chi la toi uu: ghi loi (thu muc chi doc, day dia...) thi bo qua
+        try:
+            with open(tam, 'wb') as f:
+                f.write(du_lieu)
+            os.replace(tam, duong_dan)
+        except OSError:
+            self._xoa(tam)
+            return
+        try:
+            self._don_dep()
+        except OSError:
+            pass
+
+    def _nen(self, hashi):
+        cnf = hashi.cnf
+        do_dai = array('i', map(len, cnf.clauses))
+        literal = array('i')
+        for cl in cnf.clauses:
+            literal.extend(cl)
+        idx = hashi.index
+        if hashi.bounds is not None:
+            lo, hi = hashi.bounds
+        else:
+            lo, hi = [0] * idx.num_bridges, [2] * idx.num_bridges
+        phan = [do_dai, literal, array('i', hashi.bien1), array('i', hashi.bien2),
+                idx.bridge_u, idx.bridge_v, array('i', list(lo)), array('i', list(hi))]
+        bao_cao = json.dumps(hashi.bao_cao).encode('utf-8')
+        than = b''.join(a.tobytes() for a in phan) + bao_cao
+        header = _HEADER.pack(MAGIC, VERSION, cnf.nv, len(do_dai), len(literal),
+                              idx.num_bridges, len(bao_cao), hashlib.sha256(than).digest())
+        return header + than
+
+    def _giai_nen(self, du_lieu, puzzle, encoding):
+        if len(du_lieu) < _HEADER.size:
+            return None
+        magic, version, nv, so_menh_de, so_lit, so_cau, so_byte_bc, tom_tat = \
+            _HEADER.unpack_from(du_lieu, 0)
+        if magic != MAGIC or version != VERSION:
+            return None
+        kich_thuoc = [so_menh_de, so_lit] + [so_cau] * 6
+        if len(du_lieu) != _HEADER.size + 4 * sum(kich_thuoc) + so_byte_bc:
+            return None
+        # bit bi lat trong than file -> ko khop sha256
+        if hashlib.sha256(memoryview(du_lieu)[_HEADER.size:]).digest() != tom_tat:
+            return None
+
+        phan = []
+        o = _HEADER.size
+        for n in kich_thuoc:
+            phan.append(_mang('i', du_lieu[o:o + 4 * n]))
+            o += 4 * n
+        do_dai, literal, bien1, bien2, cau_u, cau_v, lo, hi = phan
+
+        idx = puzzle.index
+        if cau_u != idx.bridge_u or cau_v != idx.bridge_v:
+            return None
+
+        hashi = HashiCNF(puzzle.grid, idx, encoding, (lo, hi))
+        if list(bien1) != hashi.bien1 or list(bien2) != hashi.bien2:
+            return None
+
+        ds = literal.tolist()
+        moc = [0] + list(accumulate(do_dai))
+        hashi.cnf.clauses = [ds[moc[i]:moc[i + 1]] for i in range(so_menh_de)]
+        hashi.cnf.nv = nv
+        try:
+            hashi.bao_cao = json.loads(du_lieu[o:].decode('utf-8'))
+        except ValueError:
+            return None
+        return hashi
+
+    def _xoa(self, duong_dan):
+        try:
+            os.remove(duong_dan)
+        except OSError:
+            pass
+
+    def _don_dep(self):
+        # xoa cac muc lau khong dung nhat cho den khi tong dung luong <= max_bytes
+        ds = []
+        tong = 0
+        for ten in os.listdir(self.thu_muc):
+            if not ten.endswith(DUOI_FILE):
+                continue
+            duong_dan = os.path.join(self.thu_muc, ten)
+            try:
+                st = os.stat(duong_dan)
+            except OSError:
+                continue
+            ds.append((st.st_mtime, st.st_size, duong_dan))
+            tong += st.st_size
+
+        ds.sort()
+        for _, kich_thuoc, duong_dan in ds:
+            if tong <= self.max_bytes:
+                break
+            self._xoa(duong_dan)
+            tong -= kich_thuoc
+
+
+def set_default_cache(cache):
+    global _cache_mac_dinh
+    _cache_mac_dinh = cache
+
+
+def get_default_cache():
+    # cache dat qua set_default_cache, hoac tu bien moi truong HASHI_CNF_CACHE
+    global _cache_mac_dinh
+    if _cache_mac_dinh is None and os.environ.get(BIEN_MOI_TRUONG):
+        _cache_mac_dinh = CNFCache(os.environ[BIEN_MOI_TRUONG])
+    return _cache_mac_dinh
+
+
+def build_cnf(puzzle, cache=None, encoding=MA_HOA_MAC_DINH, deduction=True):
+    # lay HashiCNF da sinh CNF: tu cache neu co, neu khong thi sinh roi luu
+    # deduction: co dinh truoc cac cau suy ra duoc, bo bien cua chung khoi CNF
+    if cache is None:
+        cache = get_default_cache()
+    if cache is not None:
+        hashi = cache.get(puzzle, encoding, deduction)
+        if hashi is not None:
+            return hashi
+
+    bounds = deduce(puzzle).bounds() if deduction else None
+    hashi = HashiCNF(puzzle.grid, puzzle.index, encoding, bounds)
+    hashi.generate_cnf()
+    if cache is not None:
+        cache.put(puzzle, hashi)
+    return hashi
@@ -1,133 +1,222 @@
+from itertools import combinations
 from pysat.formula import CNF
-from pysat.card import CardEnc
+from pysat.card import CardEnc, EncType
+from puzzle_index import PuzzleIndex
+
+# tang moi khi doi cach ma hoa (thu tu bien, menh de...) de vo hieu cache CNF
+ENCODING_VERSION = 1
+
+# cac cach ma hoa rang buoc tong = val cua moi dao
+# 'pairwise': ma hoa truc tiep, ko bien phu (cam moi tap k+1 literal cung dung
+# va moi tap n-k+1 literal cung sai), hop voi dao it cau
+# 'auto': voi moi dang (so literal, val) chon cach cho it menh de + bien nhat
+CAC_MA_HOA = {
+    'seqcounter': EncType.seqcounter,
+    'totalizer': EncType.totalizer,
+    'sortnetwrk': EncType.sortnetwrk,
+    'cardnetwrk': EncType.cardnetwrk,
+    'pairwise': None,
+}
+MA_HOA_MAC_DINH = 'seqcounter'
+TEN_MA_HOA = list(CAC_MA_HOA) + ['auto']
+
+# mau menh de theo (ma hoa, so literal n, val k): literal 1..n, bien phu n+1..
+_mau_ma_hoa = {}
+
+
+def _ma_hoa_truc_tiep(n, k):
+    ds = []
+    for tap in combinations(range(1, n + 1), k + 1):
+        ds.append([-x for x in tap])
+    if k > 0:
+        for tap in combinations(range(1, n + 1), n - k + 1):
+            ds.append(list(tap))
+    return ds
+
+
+def lay_mau(ma_hoa, n, k):
+    # tra ve (menh de mau, so bien phu), sinh 1 lan cho moi dang
+    khoa = (ma_hoa, n, k)
+    mau = _mau_ma_hoa.get(khoa)
+    if mau is not None:
+        return mau
+
+    if k > n:
+        # ko the du so cau -> menh de rong (vo nghiem)
+        mau = ([[]], 0)
+    elif ma_hoa == 'auto':
+        mau = min((lay_mau(m, n, k) for m in CAC_MA_HOA),
+                  key=lambda m: (len(m[0]) + m[1], len(m[0])))
+    elif CAC_MA_HOA[ma_hoa] is None:
+        mau = (_ma_hoa_truc_tiep(n, k), 0)
+    else:
+        enc = CardEnc.equals(lits=list(range(1, n + 1)), bound=k, top_id=n,
+                             encoding=CAC_MA_HOA[ma_hoa])
+        mau = ([list(cl) for cl in enc.clauses], max(enc.nv, n) - n)
+
+    _mau_ma_hoa[khoa] = mau
+    return mau
 
 
 class HashiCNF:
     # sinh CNF cho Hashi
     
-    def __init__(self, grid):
+    def __init__(self, grid, index=None, encoding=MA_HOA_MAC_DINH, bounds=None):
+        if encoding not in TEN_MA_HOA:
+            raise ValueError("ma hoa ko hop le: %s (chon: %s)" % (encoding, ', '.join(TEN_MA_HOA)))
         self.grid = grid
-        self.rows = len(grid)
-        self.cols = len(grid[0])
-        self.islands = []
-        self.bridges = []
+        self.encoding = encoding
+        # dung chung chi so voi Puzzle neu co, ko quet lai grid
+        if index is None:
+            index = PuzzleIndex.from_grid(grid)
+        self.index = index
+        # khoang so cau (lo, hi) cua moi cau tu buoc suy luan, None = [0, 2]
+        self.bounds = bounds
+        self.rows = index.rows
+        self.cols = index.cols
         self.var_pool = {}
         self.cnf = CNF()
+        # so bien / menh de moi nhom rang buoc them vao
+        self.bao_cao = {}
         
-        self._tim_dao()
-        self._tim_cau()
         self._gan_bien()
 
-    def _tim_dao(self):
-        # duyet grid tim cac o co so > 0
-        for r in range(self.rows):
-            for c in range(self.cols):
-                if self.grid[r][c] > 0:
-                    self.islands.append({
-                        'r': r, 'c': c, 
-                        'val': self.grid[r][c], 
-                        'id': len(self.islands)
-                    })
-
-    def _tim_cau(self):
-        # tim cac cap dao co the noi cau (ke nhau theo hang/cot)
-        for i, u in enumerate(self.islands):
-            # tim theo chieu ngang (sang phai)
-            for c in range(u['c'] + 1, self.cols):
-                val = self.grid[u['r']][c]
-                if val > 0:
-                    # tim dao tuong ung
-                    v = None
-                    for dao in self.islands:
-                        if dao['r'] == u['r'] and dao['c'] == c:
-                            v = dao
-                            break
-                    
-                    self.bridges.append({
-                        'u': u, 'v': v,
-                        'type': 'horizontal',
-                        'idx': len(self.bridges)
-                    })
-                    break
-
-            # tim theo chieu doc (xuong duoi)
-            for r in range(u['r'] + 1, self.rows):
-                val = self.grid[r][u['c']]
-                if val > 0:
-                    v = None
-                    for dao in self.islands:
-                        if dao['r'] == r and dao['c'] == u['c']:
-                            v = dao
-                            break
-                    
-                    self.bridges.append({
-                        'u': u, 'v': v,
-                        'type': 'vertical',
-                        'idx': len(self.bridges)
-                    })
-                    break
-
     def _gan_bien(self):
         # moi cau co 2 bien: bien[idx,1] = co 1 cau, bien[idx,2] = co 2 cau
+        # bien1/bien2 la bang tra nhanh theo id cau, var_pool giu cho ben ngoai
+        # cau da co dinh so cau (lo == hi) ko co bien: bien = 0, so cau o co_dinh
+        self.bien1 = []
+        self.bien2 = []
+        self.co_dinh = [-1] * self.index.num_bridges
         dem = 1
-        for b in self.bridges:
-            self.var_pool[(b['idx'], 1)] = dem
-            self.var_pool[(b['idx'], 2)] = dem + 1
+        for idx in range(self.index.num_bridges):
+            if self.bounds is not None:
+                lo, hi = self.bounds[0][idx], self.bounds[1][idx]
+                if lo == hi:
+                    self.co_dinh[idx] = lo
+                    self.bien1.append(0)
+                    self.bien2.append(0)
+                    continue
+            self.var_pool[(idx, 1)] = dem
+            self.var_pool[(idx, 2)] = dem + 1
+            self.bien1.append(dem)
+            self.bien2.append(dem + 1)
             dem += 2
+        self.top = dem - 1
+        # tap bien cau (de chieu model len cac bien nay)
+        self.bien_cau = set(self.var_pool.values())
+
+    def bridge_counts(self, tap_dung):
+        # so cau theo id cau, tu tap cac bien dang dung
+        kq = list(self.co_dinh)
+        for b in range(self.index.num_bridges):
+            if kq[b] < 0:
+                kq[b] = 2 if self.bien2[b] in tap_dung else (1 if self.bien1[b] in tap_dung else 0)
+        return kq
+
+    def bridge_clauses(self):
+        # cac menh de chi phu thuoc bang cau (ko phu thuoc gia tri dao)
+        chi_so = self.index
+        bien1, bien2 = self.bien1, self.bien2
+        ds = []
 
-    def generate_cnf(self):
         # rang buoc: neu co 2 cau thi phai co 1 cau (var2 -> var1)
-        for b in self.bridges:
-            idx = b['idx']
-            v1 = self.var_pool[(idx, 1)]
-            v2 = self.var_pool[(idx, 2)]
-            # v2 -> v1 tuong duong voi -v2 OR v1
-            self.cnf.append([-v2, v1])
+        # v2 -> v1 tuong duong voi -v2 OR v1
+        for idx in range(chi_so.num_bridges):
+            if bien1[idx]:
+                ds.append([-bien2[idx], bien1[idx]])
+
+        if self.bounds is not None:
+            # khoang con lai cua cau chua co dinh; lo > hi la mau thuan
+            lo, hi = self.bounds
+            for idx in range(chi_so.num_bridges):
+                if lo[idx] > hi[idx]:
+                    ds.append([])
+                elif bien1[idx]:
+                    if lo[idx] >= 1:
+                        ds.append([bien1[idx]])
+                    if hi[idx] <= 1:
+                        ds.append([-bien2[idx]])
 
         # rang buoc: cau ngang va cau doc ko duoc cat nhau
-        ds_ngang = [b for b in self.bridges if b['type'] == 'horizontal']
-        ds_doc = [b for b in self.bridges if b['type'] == 'vertical']
-
-        for h in ds_ngang:
-            for v in ds_doc:
-                # kiem tra xem 2 cau co giao nhau ko
-                h_row = h['u']['r']
-                h_c1, h_c2 = h['u']['c'], h['v']['c']
-                
-                v_col = v['u']['c']
-                v_r1, v_r2 = v['u']['r'], v['v']['r']
-                
-                # giao khi cot cua cau doc nam giua 2 dau cau ngang
-                # va hang cua cau ngang nam giua 2 dau cau doc
-                if h_c1 < v_col < h_c2 and v_r1 < h_row < v_r2:
-                    h_var = self.var_pool[(h['idx'], 1)]
-                    v_var = self.var_pool[(v['idx'], 1)]
-                    # ko the ca 2 cung co -> -h_var OR -v_var
-                    self.cnf.append([-h_var, -v_var])
+        # chi xet cac cap da co trong chi so giao cat (cau co dinh da duoc
+        # suy luan loai cac cau cat no)
+        for h in range(chi_so.num_bridges):
+            if not chi_so.bridge_horizontal[h] or not bien1[h]:
+                continue
+            h_var = bien1[h]
+            for v in chi_so.conflicts[h]:
+                if not bien1[v]:
+                    continue
+                # ko the ca 2 cung co -> -h_var OR -v_var
+                ds.append([-h_var, -bien1[v]])
+        return ds
+
+    def island_clauses(self, dao, val, top):
+        # menh de "dao co dung val cau", bien phu danh so tu top + 1
+        # tra ve (ds menh de, top moi)
+        ds_bien = []
+        # chi duyet cac cau ke voi dao nay, tru cau da co dinh
+        for b in self.index.incident[dao]:
+            if self.co_dinh[b] >= 0:
+                val -= self.co_dinh[b]
+            else:
+                ds_bien.append(self.bien1[b])
+                ds_bien.append(self.bien2[b])
+
+        n = len(ds_bien)
+        if n == 0 or val < 0:
+            # ko con cau tu do: dung neu da du so cau
+            return ([] if val == 0 else [[]]), top
+        mau, so_phu = lay_mau(self.encoding, n, val)
+        # bien mau x <= n -> ds_bien[x-1]; x > n -> top + (x - n)
+        bang = [0] + ds_bien + list(range(top + 1, top + so_phu + 1))
+        return [[bang[x] if x > 0 else -bang[-x] for x in cl] for cl in mau], top + so_phu
+
+    def generate_cnf(self):
+        # gom menh de vao 1 list roi gan 1 lan cho CNF, tu theo doi so bien
+        # (CNF.append tinh lai max cua tung menh de -> cham voi board lon)
+        chi_so = self.index
+        ds = self.bridge_clauses()
+        top = self.top
+
+        so_bien_cau = top
+        # menh de giao cat la 2 literal am, con lai la v2 -> v1 va khoang lo/hi
+        so_giao_cat = sum(1 for cl in ds if len(cl) == 2 and cl[1] < 0)
+        self.bao_cao = {
+            'hai_cau': {'so_bien': so_bien_cau, 'so_menh_de': len(ds) - so_giao_cat},
+            'giao_cat': {'so_bien': 0, 'so_menh_de': so_giao_cat},
+        }
+        truoc = len(ds)
 
         # rang buoc: moi dao phai co dung so cau yeu cau
-        for dao in self.islands:
-            ds_bien = []
-            
-            for b in self.bridges:
-                if b['u'] == dao or b['v'] == dao:
-                    ds_bien.append(self.var_pool[(b['idx'], 1)])
-                    ds_bien.append(self.var_pool[(b['idx'], 2)])
-            
-            # dung CardEnc de tao rang buoc tong = val
-            clauses = CardEnc.equals(
-                lits=ds_bien, 
-                bound=dao['val'], 
-                top_id=self.cnf.nv
-            )
-            self.cnf.extend(clauses)
+        # dung mau theo dang (so literal, val), danh so lai sang bien that
+        for dao in range(chi_so.num_islands):
+            menh_de, top = self.island_clauses(dao, chi_so.island_value[dao], top)
+            ds.extend(menh_de)
+
+        self.bao_cao['so_cau_dao'] = {'so_bien': top - so_bien_cau,
+                                      'so_menh_de': len(ds) - truoc}
 
+        self.cnf.clauses = ds
+        self.cnf.nv = top
         return self.cnf
 
+    def get_report(self):
+        kq = {k: dict(v) for k, v in self.bao_cao.items()}
+        kq['tong'] = {'so_bien': self.cnf.nv, 'so_menh_de': len(self.cnf.clauses)}
+        return kq
+
     def get_clause_list(self):
-        ds = [list(cl) for cl in self.cnf.clauses]
-        so_bien = 0
-        for cl in ds:
-            for lit in cl:
-                so_bien = max(so_bien, abs(lit))
-        return ds, so_bien
+        # tra ve chinh ds menh de (ko sao chep) va so bien da theo doi khi sinh
+        return self.cnf.clauses, self.cnf.nv
+
+
+def encoding_report(puzzle):
+    # so sanh so bien / menh de cua tung cach ma hoa tren cung puzzle
+    kq = {}
+    for ma_hoa in TEN_MA_HOA:
+        hashi = HashiCNF(puzzle.grid, puzzle.index, ma_hoa)
+        hashi.generate_cnf()
+        kq[ma_hoa] = hashi.get_report()
+    return kq
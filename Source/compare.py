@@ -1,6 +1,8 @@
+import argparse
 import subprocess
 import os
 import time
+from corpus import CorpusReader
 try:
     import psutil
     _PSUTIL_AVAILABLE = True
@@ -8,7 +10,20 @@ except Exception:
     psutil = None
     _PSUTIL_AVAILABLE = False
 
-def run_comparison():
+def ds_input(input_folder, corpus_file=None):
+    # Trả về danh sách (tên file, tham số --input cho main.py, số thứ tự)
+    if corpus_file is not None:
+        with CorpusReader(corpus_file) as corpus:
+            return [(corpus.name(i), ["--input", corpus_file, "--puzzle", str(i)], i + 1)
+                    for i in range(len(corpus))]
+    ds = []
+    for i in range(1, 11):
+        file_name = f"input-{i:02d}.txt"
+        ds.append((file_name, ["--input", os.path.join(input_folder, file_name)], i))
+    return ds
+
+
+def run_comparison(corpus_file=None):
     # Cấu hình đường dẫn
     input_folder = "Inputs"
     output_folder = "Outputs"
@@ -25,11 +40,10 @@ def run_comparison():
     print(f"{'File':<15} | {'Algo':<12} | {'Time (s)':<10} | {'Mem (MB)':<10} | {'Status'}")
     print("-" * 80)
 
-    for i in range(1, 11):
-        file_name = f"input-{i:02d}.txt"
-        input_path = os.path.join(input_folder, file_name)
+    for file_name, input_args, i in ds_input(input_folder, corpus_file):
         results[file_name] = {}
 
+        input_path = input_args[1]
         if not os.path.exists(input_path):
             print(f"Lỗi: Không tìm thấy {input_path}")
             continue
@@ -42,7 +56,7 @@ def run_comparison():
             
             cmd = [
                 "python", "main.py",
-                "--input", input_path,
+                *input_args,
                 "--algorithm", algo,
                 "--output", out_file,
                 "--quiet" # Sử dụng chế độ im lặng để dễ parse kết quả
@@ -150,4 +164,8 @@ def run_comparison():
     print("\n[Thông báo] Đã lưu kết quả vào file results.json")
 
 if __name__ == "__main__":
-    run_comparison()
+    parser = argparse.ArgumentParser(description='So sanh cac thuat toan')
+    parser.add_argument('--corpus', '-c', type=str, default=None,
+                        help='file corpus thay cho Inputs/input-01..10.txt')
+    args = parser.parse_args()
+    run_comparison(args.corpus)
@@ -0,0 +1,160 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from hashiwokakero import Puzzle
+from utils import get_input_files
+
+# dinh dang file corpus (little-endian):
+#   header: magic (8 byte), version (u16), du tru (u16), so puzzle N (u32)
+#   bang offset: N so u64, offset cua tung ban ghi tinh tu dau file
+#   ban ghi: rows (u16), cols (u16), do dai ten (u16), ten (utf-8),
+#            roi rows*cols o, moi o 1 byte (0 = trong, 1-8 = dao)
+MAGIC = b'HASHICRP'
+VERSION = 1
+_HEADER = struct.Struct('<8sHHI')
+_BAN_GHI = struct.Struct('<HHH')
+
+
+def is_corpus(duong_dan):
+    try:
+        with open(duong_dan, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def write_corpus(ds_file, duong_dan):
+    # gop nhieu file input text thanh 1 file corpus nhi phan
+    n = len(ds_file)
+    offsets = []
+    with open(duong_dan, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, n))
+        # cho trong cho bang offset, ghi lai sau
+        f.write(b'\0' * (8 * n))
+        
+        for fpath in ds_file:
+            grid = Puzzle.read_grid(fpath)
+            rows = len(grid)
+            cols = len(grid[0]) if rows > 0 else 0
+            ten = os.path.basename(fpath).encode('utf-8')
+            
+            o = bytearray()
+            for hang in grid:
+                if len(hang) != cols:
+                    raise ValueError("%s: so cot ko deu" % fpath)
+                if min(hang) < 0 or max(hang) > 8:
+                    raise ValueError("%s: gia tri o phai trong [0, 8]" % fpath)
+                o.extend(hang)
+            
+            offsets.append(f.tell())
+            f.write(_BAN_GHI.pack(rows, cols, len(ten)))
+            f.write(ten)
+            f.write(o)
+        
+        f.seek(_HEADER.size)
+        f.write(struct.pack('<%dQ' % n, *offsets))
+    return n
+
+
+class CorpusReader:
+    # doc corpus bang mmap, lay puzzle bat ky theo chi so ma ko doc phan con lai
+    
+    def __init__(self, duong_dan):
+        self.duong_dan = duong_dan
+        self._f = open(duong_dan, 'rb')
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        magic, version, _, n = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError("%s ko phai file corpus" % duong_dan)
+        if version != VERSION:
+            self.close()
+            raise ValueError("corpus version %d ko ho tro" % version)
+        
+        self.so_puzzle = n
+        self._mv = memoryview(self._mm)
+        bang = self._mv[_HEADER.size:_HEADER.size + 8 * n]
+        if sys.byteorder == 'little':
+            # doc thang tren mmap, ko sao chep
+            self._offsets = bang.cast('Q')
+        else:
+            # file luon little-endian: may big-endian thi chep ra va dao byte
+            self._offsets = array('Q', bang.tobytes())
+            self._offsets.byteswap()
+            bang.release()
+    
+    def __len__(self):
+        return self.so_puzzle
+    
+    def _doc_ban_ghi(self, i):
+        if not 0 <= i < self.so_puzzle:
+            raise IndexError("chi so puzzle %d ngoai [0, %d)" % (i, self.so_puzzle))
+        o = self._offsets[i]
+        rows, cols, do_dai_ten = _BAN_GHI.unpack_from(self._mm, o)
+        o += _BAN_GHI.size
+        return rows, cols, o, do_dai_ten
+    
+    def name(self, i):
+        _, _, o, do_dai_ten = self._doc_ban_ghi(i)
+        return bytes(self._mv[o:o + do_dai_ten]).decode('utf-8')
+    
+    def grid(self, i):
+        rows, cols, o, do_dai_ten = self._doc_ban_ghi(i)
+        o += do_dai_ten
+        return [list(self._mv[o + r * cols:o + (r + 1) * cols]) for r in range(rows)]
+    
+    def puzzle(self, i):
+        return Puzzle(self.grid(i))
+    
+    def __getitem__(self, i):
+        return self.puzzle(i)
+    
+    def __iter__(self):
+        for i in range(self.so_puzzle):
+            yield self.puzzle(i)
+    
+    def close(self):
+        if getattr(self, '_mv', None) is not None:
+            if isinstance(self._offsets, memoryview):
+                self._offsets.release()
+            self._mv.release()
+            self._mv = None
+        if getattr(self, '_mm', None) is not None:
+            self._mm.close()
+            self._mm = None
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dong goi cac file input thanh 1 file corpus')
+    parser.add_argument('inputs', nargs='+', help='file input hoac thu muc chua input-*.txt')
+    parser.add_argument('--output', '-o', type=str, required=True, help='file corpus')
+    
+    args = parser.parse_args()
+    
+    ds_file = []
+    for p in args.inputs:
+        if os.path.isdir(p):
+            ds_file.extend(get_input_files(p))
+        else:
+            ds_file.append(p)
+    
+    n = write_corpus(ds_file, args.output)
+    print("Da ghi %d puzzle vao %s" % (n, args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+from collections import deque
+
+
+# suy luan so cau bat buoc bang cac luat cuc bo, lap den diem bat dong.
+# Moi cau b co khoang [lo[b], hi[b]] trong {0, 1, 2}:
+#   - hi ban dau = min(2, val 2 dau); 1-1 ko noi voi nhau, 2-2 ko noi doi
+#     (neu ko se tach rieng thanh 1 cum, tru khi puzzle chi co 2 dao)
+#   - dao val v: lo[b] >= v - tong hi cac cau con lai,
+#                hi[b] <= v - tong lo cac cau con lai
+#     (bao gom truong hop v = 2 * so hang xom, v = tong suc chua con lai...)
+#   - cau da chac chan co (lo >= 1) -> cac cau cat no phai = 0
+# Mau thuan duoc the hien bang lo[b] > hi[b] (HashiCNF sinh menh de rong)
+
+
+class Deduction:
+
+    def __init__(self, index):
+        self.index = index
+        so_cau = index.num_bridges
+        self.lo = bytearray(so_cau)
+        self.hi = bytearray(so_cau)
+        self.mau_thuan = False
+        self.so_vong = 0
+
+        gia_tri = index.island_value
+        nhieu_dao = index.num_islands > 2
+        for b in range(so_cau):
+            vu, vv = gia_tri[index.bridge_u[b]], gia_tri[index.bridge_v[b]]
+            hi = min(2, vu, vv)
+            if nhieu_dao and vu == vv and vu <= 2:
+                hi = vu - 1
+            self.hi[b] = hi
+
+    def run(self):
+        idx = self.index
+        lo, hi = self.lo, self.hi
+        gia_tri = idx.island_value
+
+        hang_doi = deque(range(idx.num_islands))
+        trong_hang = bytearray([1]) * idx.num_islands
+
+        def day(i):
+            if not trong_hang[i]:
+                trong_hang[i] = 1
+                hang_doi.append(i)
+
+        while hang_doi and not self.mau_thuan:
+            i = hang_doi.popleft()
+            trong_hang[i] = 0
+            self.so_vong += 1
+
+            v = gia_tri[i]
+            ds = idx.incident[i]
+            if not ds:
+                # dao ko noi duoc voi ai
+                self.mau_thuan = v > 0
+                continue
+            tong_lo = sum(lo[b] for b in ds)
+            tong_hi = sum(hi[b] for b in ds)
+
+            for b in ds:
+                lo_moi = max(lo[b], v - (tong_hi - hi[b]))
+                hi_moi = min(hi[b], v - (tong_lo - lo[b]))
+                if lo_moi == lo[b] and hi_moi == hi[b]:
+                    continue
+                if lo_moi > hi_moi:
+                    # ghi lai khoang rong (lo > hi) de ben ngoai thay mau thuan
+                    hi[b] = max(hi_moi, 0)
+                    lo[b] = hi[b] + 1
+                    self.mau_thuan = True
+                    break
+
+                co_moi = lo[b] == 0 and lo_moi > 0
+                tong_lo += lo_moi - lo[b]
+                tong_hi += hi_moi - hi[b]
+                lo[b], hi[b] = lo_moi, hi_moi
+                day(idx.bridge_u[b])
+                day(idx.bridge_v[b])
+
+                if co_moi:
+                    for c in idx.conflicts[b]:
+                        if hi[c] == 0:
+                            continue
+                        if lo[c] > 0:
+                            hi[c] = 0
+                            self.mau_thuan = True
+                            break
+                        hi[c] = 0
+                        day(idx.bridge_u[c])
+                        day(idx.bridge_v[c])
+                    if self.mau_thuan:
+                        break
+
+        return not self.mau_thuan
+
+    def is_fixed(self, b):
+        return self.lo[b] == self.hi[b]
+
+    def num_fixed(self):
+        return sum(1 for b in range(self.index.num_bridges) if self.lo[b] == self.hi[b])
+
+    def bounds(self):
+        return self.lo, self.hi
+
+
+def deduce(puzzle):
+    # chay suy luan tren chi so cua puzzle, tra ve Deduction (xem .mau_thuan)
+    suy_luan = Deduction(puzzle.index)
+    suy_luan.run()
+    return suy_luan
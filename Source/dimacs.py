@@ -0,0 +1,100 @@
+import sys
+
+from hashiwokakero import PuzzleState
+
+
+# ghi CNF ra DIMACS theo tung khoi, ko tao ban sao cua ca CNF.
+# Bang bien dat trong cac dong comment truoc header:
+#   c hashi <rows> <cols> <ma hoa>
+#   c bridge <id> <r1> <c1> <r2> <c2> <co dinh> <bien1> <bien2>
+# co dinh = -1 neu cau con tu do, nguoc lai la so cau (bien1 = bien2 = 0)
+SO_MENH_DE_MOI_KHOI = 4096
+
+
+def var_map(hashi):
+    # (id, r1, c1, r2, c2, co dinh, bien1, bien2) cho moi cau
+    idx = hashi.index
+    return [(b, idx.island_row[idx.bridge_u[b]], idx.island_col[idx.bridge_u[b]],
+             idx.island_row[idx.bridge_v[b]], idx.island_col[idx.bridge_v[b]],
+             hashi.co_dinh[b], hashi.bien1[b], hashi.bien2[b])
+            for b in range(idx.num_bridges)]
+
+
+def write_dimacs(hashi, dich):
+    # dich: duong dan, '-' (stdout) hoac file text da mo
+    if dich == '-':
+        return _ghi(hashi, sys.stdout)
+    if isinstance(dich, str):
+        with open(dich, 'w', encoding='ascii', buffering=1 << 20) as f:
+            return _ghi(hashi, f)
+    return _ghi(hashi, dich)
+
+
+def _ghi(hashi, f):
+    cnf = hashi.cnf
+    f.write("c hashi %d %d %s\n" % (hashi.rows, hashi.cols, hashi.encoding))
+    khoi = []
+    for dong in var_map(hashi):
+        khoi.append("c bridge %d %d %d %d %d %d %d %d\n" % dong)
+        if len(khoi) >= SO_MENH_DE_MOI_KHOI:
+            f.write(''.join(khoi))
+            khoi = []
+    f.write(''.join(khoi))
+
+    # nv va so menh de da biet, ko can duyet truoc
+    f.write("p cnf %d %d\n" % (cnf.nv, len(cnf.clauses)))
+    ds = cnf.clauses
+    for i in range(0, len(ds), SO_MENH_DE_MOI_KHOI):
+        f.write(''.join(' '.join(map(str, cl)) + ' 0\n' for cl in ds[i:i + SO_MENH_DE_MOI_KHOI]))
+    return len(ds)
+
+
+def read_var_map(duong_dan):
+    # doc bang bien tu cac dong comment cua file DIMACS, dung o header
+    ds = []
+    with open(duong_dan, encoding='ascii') as f:
+        for dong in f:
+            if dong.startswith('p '):
+                break
+            if dong.startswith('c bridge '):
+                ds.append(tuple(int(x) for x in dong.split()[2:]))
+    return ds
+
+
+def read_model(duong_dan):
+    # doc model: dang output cua SAT solver ("s ...", "v ... 0") hoac chi la
+    # cac so nguyen; tra ve tap literal dung, None neu UNSAT
+    tap = set()
+    with open(duong_dan, encoding='ascii') as f:
+        for dong in f:
+            phan = dong.split()
+            if not phan or phan[0] == 'c':
+                continue
+            if phan[0] == 's':
+                if 'UNSAT' in dong.upper():
+                    return None
+                continue
+            if phan[0] == 'v':
+                phan = phan[1:]
+            for x in phan:
+                lit = int(x)
+                if lit > 0:
+                    tap.add(lit)
+    return tap
+
+
+def load_model(duong_dan, puzzle, bang_bien):
+    # chuyen file model thanh PuzzleState theo bang bien (var_map / read_var_map)
+    # ko kiem tra lien thong: dung puzzle.is_solution de kiem tra
+    tap = read_model(duong_dan)
+    if tap is None:
+        return None
+
+    state = PuzzleState()
+    for _, r1, c1, r2, c2, co_dinh, v1, v2 in bang_bien:
+        so_cau = co_dinh
+        if so_cau < 0:
+            so_cau = 2 if v2 in tap else (1 if v1 in tap else 0)
+        if so_cau > 0:
+            state.add_bridge(puzzle.island_map[(r1, c1)], puzzle.island_map[(r2, c2)], so_cau)
+    return state
@@ -0,0 +1,211 @@
+import heapq
+import time
+import tracemalloc
+
+from hashiwokakero import PuzzleState
+
+
+# A* truc tiep tren cau cua puzzle (ko qua CNF).
+# Node: so cau cua moi cau (counts), cau da quyet dinh xong chua (xong) va so
+# cau hien co cua moi dao (bac), deu la bytes.
+# Hanh dong: chon 1 cau chua quyet dinh, dat so cau 0 / 1 / 2 cho no; dat > 0
+# thi dong luon cac cau cat no (chi so giao cat cua PuzzleIndex).
+# Chi phi: 1 cho moi cau (don vi) + 1 cho moi lan gop 2 thanh phan lien thong
+#   g = so don vi cau + (so dao - so thanh phan)
+#   h = ceil(tong so cau con thieu / 2) + so thanh phan - 1
+# h ko vuot chi phi con lai (moi don vi cau giam thieu hut 2, moi lan gop giam
+# so thanh phan 1) nen h chap nhan duoc; moi loi giai co cung chi phi nen tren
+# node con song f = g + h ko doi, thu tu mo rong do h quyet dinh.
+# Re nhanh theo so cau cua 1 cau la phan hoach ko gian nen ko can tap da xet.
+
+
+class DomainAStarSolver:
+
+    def __init__(self, puzzle, gioi_han_tg=60, gioi_han_node=2000000):
+        self.puzzle = puzzle
+        self.index = puzzle.index
+        self.gioi_han_tg = gioi_han_tg
+        self.gioi_han_node = gioi_han_node
+        self.tg_chay = 0
+        self.thong_ke = {}
+
+    def _dat(self, counts, xong, bac, b, so_cau, hang_doi):
+        # quyet dinh cau b = so_cau; dat > 0 thi dong cac cau cat no
+        idx = self.index
+        xong[b] = 1
+        if so_cau == 0:
+            hang_doi.append(idx.bridge_u[b])
+            hang_doi.append(idx.bridge_v[b])
+            return
+        counts[b] = so_cau
+        bac[idx.bridge_u[b]] += so_cau
+        bac[idx.bridge_v[b]] += so_cau
+        hang_doi.append(idx.bridge_u[b])
+        hang_doi.append(idx.bridge_v[b])
+        for x in idx.conflicts[b]:
+            if not xong[x]:
+                xong[x] = 1
+                hang_doi.append(idx.bridge_u[x])
+                hang_doi.append(idx.bridge_v[x])
+
+    def _suc_chua(self, b, i, bac):
+        # so cau toi da cau b (chua quyet dinh) con nhan duoc nhin tu dao i
+        idx = self.index
+        gia_tri = idx.island_value
+        j = idx.other_end(b, i)
+        return min(2, gia_tri[i] - bac[i], gia_tri[j] - bac[j])
+
+    def _lan_truyen(self, counts, xong, bac, hang_doi):
+        # luat cuc bo tren dao: du cau -> dong cac cau con lai; so cau con
+        # thieu = tong suc chua -> dat toi da moi cau; False neu het cach
+        idx = self.index
+        gia_tri = idx.island_value
+        while hang_doi:
+            i = hang_doi.pop()
+            thieu = gia_tri[i] - bac[i]
+            if thieu < 0:
+                return False
+            mo = [b for b in idx.incident[i] if not xong[b]]
+            if not mo:
+                if thieu > 0:
+                    return False
+                continue
+            if thieu == 0:
+                for b in mo:
+                    self._dat(counts, xong, bac, b, 0, hang_doi)
+                continue
+            suc_chua = [self._suc_chua(b, i, bac) for b in mo]
+            tong = sum(suc_chua)
+            if tong < thieu:
+                return False
+            if tong == thieu:
+                for b, c in zip(mo, suc_chua):
+                    if not xong[b]:
+                        self._dat(counts, xong, bac, b, c, hang_doi)
+        return True
+
+    def _uoc_luong(self, counts, bac):
+        # tra ve (g, h), None neu co thanh phan da du cau ma con tach roi
+        idx = self.index
+        gia_tri = idx.island_value
+        nhan, so_tp = idx.components(counts)
+        thieu_tp = [0] * so_tp
+        tong_thieu = 0
+        for i in range(idx.num_islands):
+            thieu = gia_tri[i] - bac[i]
+            thieu_tp[nhan[i]] += thieu
+            tong_thieu += thieu
+        if so_tp > 1 and min(thieu_tp) == 0:
+            return None
+        so_don_vi = sum(counts)
+        g = so_don_vi + idx.num_islands - so_tp
+        h = (tong_thieu + 1) // 2 + so_tp - 1
+        return g, h
+
+    def _chon_cau(self, xong, bac):
+        # dao con thieu co it cau mo nhat, lay cau mo dau tien cua no
+        idx = self.index
+        gia_tri = idx.island_value
+        bu, bv = idx.bridge_u, idx.bridge_v
+        # dem cau mo cua moi dao trong 1 lan duyet cau
+        so_mo = [0] * idx.num_islands
+        for b in range(idx.num_bridges):
+            if not xong[b]:
+                so_mo[bu[b]] += 1
+                so_mo[bv[b]] += 1
+        tot, it_nhat = -1, 0
+        for i in range(idx.num_islands):
+            k = so_mo[i]
+            if k and gia_tri[i] != bac[i] and (tot < 0 or k < it_nhat):
+                tot, it_nhat = i, k
+                if k == 1:
+                    break
+        if tot < 0:
+            return None
+        for b in idx.incident[tot]:
+            if not xong[b]:
+                return b
+
+    def _tao_state(self, counts):
+        st = PuzzleState()
+        idx = self.index
+        dao = self.puzzle.islands
+        for b in range(idx.num_bridges):
+            if counts[b] > 0:
+                st.add_bridge(dao[idx.bridge_u[b]], dao[idx.bridge_v[b]], counts[b])
+        return st
+
+    def solve(self):
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        idx = self.index
+        thong_ke = {'nodes_expanded': 0, 'nodes_generated': 0, 'max_open_size': 0,
+                    'timed_out': False, 'algorithm': 'Domain A*'}
+        self.thong_ke = thong_ke
+        loi_giai = None
+
+        heap = []
+        dem_id = 0
+        counts = bytearray(idx.num_bridges)
+        xong = bytearray(idx.num_bridges)
+        bac = bytearray(idx.num_islands)
+        if self._lan_truyen(counts, xong, bac, list(range(idx.num_islands))):
+            gh = self._uoc_luong(counts, bac)
+            if gh is not None:
+                heap.append((gh[0] + gh[1], gh[1], dem_id, bytes(counts), bytes(xong), bytes(bac)))
+                thong_ke['nodes_generated'] = 1
+
+        while heap:
+            if time.perf_counter() - t0 > self.gioi_han_tg:
+                thong_ke['timed_out'] = True
+                break
+            if thong_ke['nodes_expanded'] >= self.gioi_han_node:
+                break
+            thong_ke['max_open_size'] = max(thong_ke['max_open_size'], len(heap))
+            _, h, _, counts_nut, xong_nut, bac_nut = heapq.heappop(heap)
+            thong_ke['nodes_expanded'] += 1
+
+            if h == 0:
+                # du cau va lien thong; cau chua quyet dinh = 0
+                st = self._tao_state(counts_nut)
+                if self.puzzle.is_solution(st):
+                    loi_giai = st
+                    break
+                continue
+
+            b = self._chon_cau(xong_nut, bac_nut)
+            if b is None:
+                continue
+            toi_da = self._suc_chua(b, idx.bridge_u[b], bac_nut)
+            for so_cau in range(toi_da, -1, -1):
+                counts = bytearray(counts_nut)
+                xong = bytearray(xong_nut)
+                bac = bytearray(bac_nut)
+                hang_doi = []
+                self._dat(counts, xong, bac, b, so_cau, hang_doi)
+                if not self._lan_truyen(counts, xong, bac, hang_doi):
+                    continue
+                gh = self._uoc_luong(counts, bac)
+                if gh is None:
+                    continue
+                dem_id += 1
+                heapq.heappush(heap, (gh[0] + gh[1], gh[1], dem_id, bytes(counts), bytes(xong), bytes(bac)))
+                thong_ke['nodes_generated'] += 1
+
+        _, peak_mem = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.tg_chay = time.perf_counter() - t0
+        thong_ke['peak_memory_bytes'] = peak_mem
+        thong_ke['num_bridges'] = idx.num_bridges
+        return loi_giai
+
+    def get_stats(self):
+        kq = dict(self.thong_ke)
+        kq['time'] = self.tg_chay
+        return kq
+
+
+def solve_domain_astar(puzzle, gioi_han_tg=60, gioi_han_node=2000000):
+    solver = DomainAStarSolver(puzzle, gioi_han_tg, gioi_han_node)
+    kq = solver.solve()
+    return kq, solver.tg_chay, solver.get_stats()
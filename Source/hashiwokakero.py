@@ -1,5 +1,13 @@
+from array import array
 from dataclasses import dataclass, field
 from enum import Enum
+from puzzle_index import PuzzleIndex, zobrist_key, NUMPY_MIN_CELLS
+try:
+    import numpy as np
+    _NUMPY_AVAILABLE = True
+except Exception:
+    np = None
+    _NUMPY_AVAILABLE = False
 
 
 class Direction(Enum):
@@ -14,6 +22,7 @@ class Island:
     row: int
     col: int
     value: int
+    id: int = -1
     
     def __hash__(self):
         return hash((self.row, self.col))
@@ -71,33 +80,51 @@ class Bridge:
         return self.island1 == khac.island1 and self.island2 == khac.island2
 
 
+def _khoa_cau(k, so_cau):
+    return zobrist_key(k[0].row, k[0].col, k[1].row, k[1].col, so_cau)
+
+
 @dataclass
 class PuzzleState:
     bridges: dict = field(default_factory=dict)
+    # hash Zobrist 64-bit, cap nhat O(1) moi lan them/doi cau
+    zobrist: int = field(default=0, compare=False, repr=False)
+    
+    def __post_init__(self):
+        # tinh lai neu khoi tao voi bridges co san
+        z = 0
+        for k, v in self.bridges.items():
+            if v > 0:
+                z ^= _khoa_cau(k, v)
+        self.zobrist = z
     
     def copy(self):
         st = PuzzleState()
         st.bridges = dict(self.bridges)
+        st.zobrist = self.zobrist
         return st
     
-    def add_bridge(self, d1, d2, so_cau=1):
+    def _khoa(self, d1, d2):
         # dam bao thu tu nhat quan
         if (d1.row, d1.col) < (d2.row, d2.col):
-            k = (d1, d2)
-        else:
-            k = (d2, d1)
-        
-        if k in self.bridges:
-            self.bridges[k] += so_cau
-        else:
-            self.bridges[k] = so_cau
+            return (d1, d2)
+        return (d2, d1)
+    
+    def set_bridge(self, d1, d2, so_cau):
+        k = self._khoa(d1, d2)
+        cu = self.bridges.get(k, 0)
+        if cu > 0:
+            self.zobrist ^= _khoa_cau(k, cu)
+        if so_cau > 0:
+            self.zobrist ^= _khoa_cau(k, so_cau)
+        self.bridges[k] = so_cau
+    
+    def add_bridge(self, d1, d2, so_cau=1):
+        k = self._khoa(d1, d2)
+        self.set_bridge(k[0], k[1], self.bridges.get(k, 0) + so_cau)
     
     def get_bridge_count(self, d1, d2):
-        if (d1.row, d1.col) < (d2.row, d2.col):
-            k = (d1, d2)
-        else:
-            k = (d2, d1)
-        return self.bridges.get(k, 0)
+        return self.bridges.get(self._khoa(d1, d2), 0)
     
     def get_total_bridges(self, dao, ds_neighbor):
         tong = 0
@@ -106,27 +133,83 @@ class PuzzleState:
         return tong
     
     def __hash__(self):
-        items = []
-        for k, v in self.bridges.items():
-            items.append((k[0].row, k[0].col, k[1].row, k[1].col, v))
-        items.sort()
-        return hash(tuple(items))
+        return self.zobrist
     
     def __eq__(self, khac):
         if not isinstance(khac, PuzzleState):
             return False
+        # so hash truoc, chi so dict khi trung hash
+        if self.zobrist != khac.zobrist:
+            return False
         return self.bridges == khac.bridges
     
     def __lt__(self, khac):
-        return hash(self) < hash(khac)
+        return self.zobrist < khac.zobrist
+
+
+class TrailState:
+    # trang thai dang mang co dinh cho tim kiem: so cau theo id cau, so cau
+    # cua moi dao theo id dao; thay doi tai cho bang apply/undo qua trail
+    
+    def __init__(self, index):
+        self.index = index
+        self.counts = bytearray(index.num_bridges)
+        self.degree = array('i', [0]) * index.num_islands
+        # trail phang: id cau, so cau, id cau, so cau, ...
+        self.trail = []
+        # cung khoa voi PuzzleState nen 2 dang cho cung hash
+        self._bang_zobrist = index.zobrist_table()
+        self.zobrist = 0
+    
+    def apply(self, b, so_cau):
+        cu = self.counts[b]
+        tab = self._bang_zobrist
+        self.zobrist ^= tab[3 * b + cu] ^ tab[3 * b + cu + so_cau]
+        self.counts[b] = cu + so_cau
+        self.degree[self.index.bridge_u[b]] += so_cau
+        self.degree[self.index.bridge_v[b]] += so_cau
+        self.trail.append(b)
+        self.trail.append(so_cau)
+    
+    def undo(self):
+        so_cau = self.trail.pop()
+        b = self.trail.pop()
+        moi = self.counts[b]
+        tab = self._bang_zobrist
+        self.zobrist ^= tab[3 * b + moi] ^ tab[3 * b + moi - so_cau]
+        self.counts[b] = moi - so_cau
+        self.degree[self.index.bridge_u[b]] -= so_cau
+        self.degree[self.index.bridge_v[b]] -= so_cau
+    
+    def mark(self):
+        return len(self.trail)
+    
+    def undo_to(self, moc):
+        while len(self.trail) > moc:
+            self.undo()
+    
+    def to_puzzle_state(self, puzzle):
+        # chuyen sang PuzzleState (dang dict) de in/luu ket qua
+        st = PuzzleState()
+        idx = self.index
+        for b in range(idx.num_bridges):
+            if self.counts[b] > 0:
+                st.add_bridge(puzzle.islands[idx.bridge_u[b]],
+                              puzzle.islands[idx.bridge_v[b]], self.counts[b])
+        return st
 
 
 class Puzzle:
     
-    def __init__(self, grid):
+    def __init__(self, grid, index=None):
+        # grid = None: che do thua, chi co chi so (toa do dao)
         self.grid = grid
-        self.rows = len(grid)
-        self.cols = len(grid[0]) if len(grid) > 0 else 0
+        # chi so nguyen dung chung (dao, cau, ds cau ke) cho moi solver
+        if index is None:
+            index = PuzzleIndex.from_grid(grid)
+        self.index = index
+        self.rows = index.rows
+        self.cols = index.cols
         self.islands = []
         self.island_map = {}
         self.neighbors = {}
@@ -135,42 +218,34 @@ class Puzzle:
         self._tim_neighbor()
     
     def _doc_grid(self):
-        # duyet qua grid de tim cac dao
-        for r in range(self.rows):
-            for c in range(self.cols):
-                v = self.grid[r][c]
-                if v > 0:
-                    dao = Island(r, c, v)
-                    self.islands.append(dao)
-                    self.island_map[(r, c)] = dao
+        # tao dao tu chi so, id cua dao trung voi id trong chi so
+        idx = self.index
+        for i in range(idx.num_islands):
+            r, c = idx.island_row[i], idx.island_col[i]
+            dao = Island(r, c, idx.island_value[i], i)
+            self.islands.append(dao)
+            self.island_map[(r, c)] = dao
     
     def _tim_neighbor(self):
-        # voi moi dao, tim cac dao ke theo 4 huong
+        # hang xom lay tu ds cau ke cua chi so
+        idx = self.index
         for dao in self.islands:
-            self.neighbors[dao] = []
-            
-            for huong in Direction:
-                dr, dc = huong.value
-                r, c = dao.row + dr, dao.col + dc
-                
-                # di theo huong cho den khi gap dao hoac ra ngoai
-                while 0 <= r < self.rows and 0 <= c < self.cols:
-                    if (r, c) in self.island_map:
-                        self.neighbors[dao].append(self.island_map[(r, c)])
-                        break
-                    r += dr
-                    c += dc
+            self.neighbors[dao] = [self.islands[idx.other_end(b, dao.id)]
+                                   for b in idx.incident[dao.id]]
     
     def get_possible_bridges(self):
-        # lay tat ca cap dao co the noi cau
-        ds = set()
-        for dao in self.islands:
-            for nb in self.neighbors[dao]:
-                if (dao.row, dao.col) < (nb.row, nb.col):
-                    ds.add((dao, nb))
-                else:
-                    ds.add((nb, dao))
-        return list(ds)
+        # lay tat ca cap dao co the noi cau, theo thu tu id cau
+        idx = self.index
+        return [(self.islands[idx.bridge_u[b]], self.islands[idx.bridge_v[b]])
+                for b in range(idx.num_bridges)]
+    
+    def degrees(self, state):
+        # so cau cua moi dao (theo id), 1 lan duyet qua state
+        bac = [0] * len(self.islands)
+        for k, cnt in state.bridges.items():
+            bac[k[0].id] += cnt
+            bac[k[1].id] += cnt
+        return bac
     
     def bridges_cross(self, s1, e1, s2, e2):
         # kiem tra 2 cau co cat nhau khong
@@ -216,46 +291,61 @@ class Puzzle:
         if len(self.islands) == 0:
             return True
         
-        da_tham = set()
-        hang_doi = [self.islands[0]]
-        da_tham.add(self.islands[0])
+        # ds ke theo id, chi gom cac cau dang co
+        ke = [[] for _ in self.islands]
+        for k, cnt in state.bridges.items():
+            if cnt > 0:
+                ke[k[0].id].append(k[1].id)
+                ke[k[1].id].append(k[0].id)
+        
+        da_tham = [False] * len(self.islands)
+        da_tham[0] = True
+        hang_doi = [0]
+        so_tham = 1
         
         while hang_doi:
-            hien_tai = hang_doi.pop(0)
-            for nb in self.neighbors[hien_tai]:
-                if nb not in da_tham and state.get_bridge_count(hien_tai, nb) > 0:
-                    da_tham.add(nb)
+            hien_tai = hang_doi.pop()
+            for nb in ke[hien_tai]:
+                if not da_tham[nb]:
+                    da_tham[nb] = True
+                    so_tham += 1
                     hang_doi.append(nb)
         
-        return len(da_tham) == len(self.islands)
+        return so_tham == len(self.islands)
     
     def is_valid(self, state):
         # kiem tra trang thai hop le (chua vuot qua so cau yeu cau, ko cat nhau)
+        bac = self.degrees(state)
         for dao in self.islands:
-            so_cau = state.get_total_bridges(dao, self.neighbors[dao])
-            if so_cau > dao.value:
+            if bac[dao.id] > dao.value:
                 return False
         
-        # lay danh sach cac cau dang co
+        # danh dau cac cau dang co theo id
+        idx = self.index
+        dang_co = bytearray(idx.num_bridges)
         ds_cau = []
         for k, cnt in state.bridges.items():
             if cnt > 0:
-                ds_cau.append(k)
+                b = idx.bridge_id(k[0].id, k[1].id)
+                if b < 0:
+                    # 2 dao ko phai hang xom (ko co cau ung vien)
+                    return False
+                dang_co[b] = 1
+                ds_cau.append(b)
         
-        # kiem tra tung cap cau xem co cat nhau ko
-        for i in range(len(ds_cau)):
-            for j in range(i + 1, len(ds_cau)):
-                c1, c2 = ds_cau[i], ds_cau[j]
-                if self.bridges_cross(c1[0], c1[1], c2[0], c2[1]):
+        # chi xet cac cau cat qua tung cau dang co
+        for b in ds_cau:
+            for x in idx.conflicts[b]:
+                if dang_co[x]:
                     return False
         
         return True
     
     def is_solution(self, state):
         # kiem tra da giai xong chua
+        bac = self.degrees(state)
         for dao in self.islands:
-            so_cau = state.get_total_bridges(dao, self.neighbors[dao])
-            if so_cau != dao.value:
+            if bac[dao.id] != dao.value:
                 return False
         
         if not self.is_connected(state):
@@ -265,6 +355,9 @@ class Puzzle:
     
     def state_to_output(self, state):
         # chuyen state thanh dang output de hien thi
+        if _NUMPY_AVAILABLE and self.rows * self.cols >= NUMPY_MIN_CELLS:
+            return self._state_to_output_numpy(state)
+        
         out = []
         for r in range(self.rows):
             dong = ['0'] * self.cols
@@ -296,8 +389,33 @@ class Puzzle:
         
         return out
     
+    def _state_to_output_numpy(self, state):
+        # mang ky tu cap phat 1 lan, ve cau bang gan theo lat cat
+        out = np.full((self.rows, self.cols), '0', dtype='<U1')
+        idx = self.index
+        if idx.num_islands > 0:
+            rr = np.frombuffer(idx.island_row, dtype=np.int32)
+            cc = np.frombuffer(idx.island_col, dtype=np.int32)
+            vals = np.frombuffer(idx.island_value, dtype=np.int8)
+            out[rr, cc] = vals.astype('<U1')
+        
+        for k, cnt in state.bridges.items():
+            if cnt == 0:
+                continue
+            
+            d1, d2 = k
+            
+            if d1.row == d2.row:
+                c1, c2 = min(d1.col, d2.col), max(d1.col, d2.col)
+                out[d1.row, c1 + 1:c2] = '-' if cnt == 1 else '='
+            else:
+                r1, r2 = min(d1.row, d2.row), max(d1.row, d2.row)
+                out[r1 + 1:r2, d1.col] = '|' if cnt == 1 else '$'
+        
+        return out.tolist()
+    
     @staticmethod
-    def from_file(duong_dan):
+    def read_grid(duong_dan):
         grid = []
         with open(duong_dan, 'r') as f:
             for dong in f:
@@ -306,7 +424,14 @@ class Puzzle:
                     parts = dong.split(',')
                     hang = [int(p.strip()) for p in parts]
                     grid.append(hang)
-        return Puzzle(grid)
+        return grid
+    
+    @staticmethod
+    def from_file(duong_dan, sparse=False):
+        if sparse:
+            # doc tung dong, ko dung luoi day du (cho board rat lon, thua)
+            return Puzzle(None, PuzzleIndex.from_file(duong_dan))
+        return Puzzle(Puzzle.read_grid(duong_dan))
     
     def __repr__(self):
         return "Puzzle(%dx%d, %d dao)" % (self.rows, self.cols, len(self.islands))
@@ -1,21 +1,31 @@
 import argparse
+import contextlib
+import json
 import os
 import sys
 import time
 
 from hashiwokakero import Puzzle, PuzzleState
-from sat_solver import solve_sat
-from astar_to_solve_cnf import solve_astar  
+from sat_solver import solve_sat, count_solutions, SolveLimitReached, CAC_CACH_LIEN_THONG, CAC_BACKEND, BACKEND_MAC_DINH, backend_co_san
+from astar_to_solve_cnf import solve_astar, CAC_CHE_DO, GIOI_HAN_BO_NHO_MAC_DINH
+from domain_astar import solve_domain_astar
 from brute_force_solver import solve_bruteforce
 from backtracking_solver import solve_backtracking
+from portfolio import solve_portfolio, CAC_THANH_VIEN, THANH_VIEN_MAC_DINH
 from utils import print_puzzle, print_solution, print_output, save_output, compare_algorithms, make_table, get_input_files
+from corpus import CorpusReader, is_corpus
+from cnf_cache import CNFCache, set_default_cache, build_cnf
+from dimacs import write_dimacs, read_var_map, load_model
+from cnf_generator import TEN_MA_HOA, MA_HOA_MAC_DINH, encoding_report
 
 
 CAC_SOLVER = {
     'pysat': solve_sat,
     'astar': solve_astar,
+    'astar-domain': solve_domain_astar,
     'bruteforce': solve_bruteforce,
-    'backtracking': solve_backtracking
+    'backtracking': solve_backtracking,
+    'portfolio': solve_portfolio
 }
 
 
@@ -23,11 +33,20 @@ def get_solver(ten):
     return CAC_SOLVER.get(ten.lower())
 
 
-def giai_puzzle(file_input, algo='pysat', file_output=None, in_ra=True, folder_out='Outputs'):
+def doc_puzzle(file_input, chi_so=None, thua=False):
+    # doc 1 puzzle tu file text hoac tu file corpus (theo chi so), tra ve (puzzle, ten)
+    if is_corpus(file_input):
+        with CorpusReader(file_input) as corpus:
+            i = chi_so if chi_so is not None else 0
+            return corpus.puzzle(i), corpus.name(i)
+    return Puzzle.from_file(file_input, sparse=thua), os.path.basename(file_input)
+
+
+def giai_puzzle(file_input, algo='pysat', file_output=None, in_ra=True, folder_out='Outputs', chi_so=None, thua=False, tham_so=None):
     if in_ra:
         print("Dang doc:", file_input)
     
-    puzzle = Puzzle.from_file(file_input)
+    puzzle, fname = doc_puzzle(file_input, chi_so, thua)
     
     if in_ra:
         print_puzzle(puzzle)
@@ -35,16 +54,20 @@ def giai_puzzle(file_input, algo='pysat', file_output=None, in_ra=True, folder_o
     solver_fn = get_solver(algo)
     if solver_fn == None:
         print("Khong biet thuat toan:", algo)
-        print("Chon: pysat, astar, bruteforce, backtracking")
+        print("Chon:", ", ".join(CAC_SOLVER))
         return None
     
     if in_ra:
         print("Dang giai bang", algo, "...")
     
-    loi_giai, thoi_gian, stats = solver_fn(puzzle)
+    # tham so rieng cua thuat toan (vd encoding cho pysat/astar)
+    loi_giai, thoi_gian, stats = solver_fn(puzzle, **(tham_so or {}))
     
     if loi_giai == None:
-        print("Khong tim duoc loi giai!")
+        if stats.get('trang_thai') == 'unknown':
+            print("Het gioi han thoi gian / ngan sach, chua co ket qua!")
+        else:
+            print("Khong tim duoc loi giai!")
         return None
     
     if in_ra:
@@ -59,7 +82,6 @@ def giai_puzzle(file_input, algo='pysat', file_output=None, in_ra=True, folder_o
     
     # Tu dong luu vao subfolder theo thuat toan neu khong chi dinh file output
     if file_output == None:
-        fname = os.path.basename(file_input)
         out_name = fname.replace('input-', 'output-')
         algo_folder = os.path.join(folder_out, algo.lower())
         os.makedirs(algo_folder, exist_ok=True)
@@ -79,16 +101,36 @@ def giai_puzzle(file_input, algo='pysat', file_output=None, in_ra=True, folder_o
     return loi_giai
 
 
-def chay_benchmark(folder_in='Inputs', folder_out='Outputs'):
+def mo_corpus(file_corpus):
+    # CorpusReader dung voi with (dong mmap khi xong), hoac ko lam gi neu ko co corpus
+    if file_corpus is None:
+        return contextlib.nullcontext()
+    return CorpusReader(file_corpus)
+
+
+def ds_puzzle_benchmark(folder_in='Inputs', corpus=None):
+    # sinh (ten, ham doc puzzle) tu thu muc input hoac tu corpus da mo
+    if corpus is not None:
+        return [(corpus.name(i), (lambda i=i: corpus.puzzle(i))) for i in range(len(corpus))]
+    return [(os.path.basename(f), (lambda f=f: Puzzle.from_file(f)))
+            for f in get_input_files(folder_in)]
+
+
+def chay_benchmark(folder_in='Inputs', folder_out='Outputs', file_corpus=None):
+    with mo_corpus(file_corpus) as corpus:
+        _chay_benchmark(folder_in, folder_out, corpus, file_corpus)
+
+
+def _chay_benchmark(folder_in, folder_out, corpus, file_corpus):
     print("=" * 50)
     print("HASHIWOKAKERO BENCHMARK")
     print("=" * 50)
     print()
     
-    cac_file = get_input_files(folder_in)
+    cac_file = ds_puzzle_benchmark(folder_in, corpus)
     
     if len(cac_file) == 0:
-        print("Khong tim thay file input trong", folder_in)
+        print("Khong tim thay file input trong", file_corpus or folder_in)
         return
     
     print("Tim thay %d file" % len(cac_file))
@@ -109,14 +151,13 @@ def chay_benchmark(folder_in='Inputs', folder_out='Outputs'):
     
     tat_ca_ket_qua = {}
     
-    for fpath in cac_file:
-        fname = os.path.basename(fpath)
+    for fname, doc in cac_file:
         print("-" * 50)
         print("Testing:", fname)
         print("-" * 50)
         
         try:
-            puzzle = Puzzle.from_file(fpath)
+            puzzle = doc()
             so_dao = len(puzzle.islands)
             print("Kich thuoc: %dx%d, %d dao" % (puzzle.rows, puzzle.cols, so_dao))
             print()
@@ -167,24 +208,191 @@ def chay_benchmark(folder_in='Inputs', folder_out='Outputs'):
     print("Xong!")
 
 
+def chay_benchmark_sat(folder_in='Inputs', file_corpus=None, file_json='results_sat_backend.json'):
+    with mo_corpus(file_corpus) as corpus:
+        _chay_benchmark_sat(folder_in, corpus, file_corpus, file_json)
+
+
+def _chay_benchmark_sat(folder_in, corpus, file_corpus, file_json):
+    # chay pysat voi tung backend co san tren moi puzzle, ghi thoi gian giai
+    # (chi phan backend), thoi gian ma hoa, so conflict va propagation de chon
+    # backend mac dinh
+    cac_file = ds_puzzle_benchmark(folder_in, corpus)
+    if len(cac_file) == 0:
+        print("Khong tim thay file input trong", file_corpus or folder_in)
+        return
+    
+    ds_backend = backend_co_san()
+    print("Backend: %s" % ", ".join(ds_backend))
+    print()
+    print("%-16s %-12s %10s %10s %10s %12s %s" % ("Puzzle", "Backend", "Encode", "Solve", "Conflicts",
+                                                  "Propagations", "OK"))
+    print("-" * 79)
+    
+    ket_qua = {}
+    for fname, doc in cac_file:
+        puzzle = doc()
+        ket_qua[fname] = {}
+        for backend in ds_backend:
+            loi_giai, thoi_gian, stats = solve_sat(puzzle, backend=backend)
+            ok = loi_giai is not None and puzzle.is_solution(loi_giai)
+            # time: chi thoi gian backend giai, ma hoa CNF tinh rieng
+            tg_giai = stats.get('tg_giai', 0.0)
+            tg_ma_hoa = stats.get('tg_ma_hoa', 0.0)
+            ket_qua[fname][backend] = {
+                'time': round(tg_giai, 6),
+                'encode_time': round(tg_ma_hoa, 6),
+                'total_time': round(thoi_gian, 6),
+                'conflicts': stats.get('conflicts', 0),
+                'propagations': stats.get('propagations', 0),
+                'success': ok
+            }
+            print("%-16s %-12s %10.4f %10.4f %10d %12d %s" % (fname, backend, tg_ma_hoa, tg_giai,
+                                                              stats.get('conflicts', 0),
+                                                              stats.get('propagations', 0), "x" if ok else "-"))
+    
+    # tong thoi gian giai moi backend tren ca bo
+    print()
+    for backend in ds_backend:
+        tong = sum(kq[backend]['time'] for kq in ket_qua.values())
+        print("%-12s tong giai %.4f giay" % (backend, tong))
+    
+    with open(file_json, 'w', encoding='utf-8') as f:
+        json.dump(ket_qua, f, indent=4)
+    print()
+    print("Da luu:", file_json)
+
+
+def in_bao_cao_ma_hoa(puzzle):
+    # bang so bien / menh de moi nhom rang buoc theo tung cach ma hoa
+    bao_cao = encoding_report(puzzle)
+    nhom = ['hai_cau', 'giao_cat', 'so_cau_dao', 'tong']
+    print("%-12s" % "Ma hoa" + "".join(" | %-18s" % n for n in nhom))
+    print("-" * (12 + 21 * len(nhom)))
+    for ma_hoa, bc in bao_cao.items():
+        dong = "%-12s" % ma_hoa
+        for n in nhom:
+            dong += " | %7d bien %5d" % (bc[n]['so_bien'], bc[n]['so_menh_de'])
+        print(dong)
+    print("(moi o: so bien, so menh de)")
+
+
 def main():
     parser = argparse.ArgumentParser(description='Hashiwokakero Puzzle Solver')
     
-    parser.add_argument('--input', '-i', type=str, help='file input')
+    parser.add_argument('--input', '-i', type=str, help='file input (text hoac corpus)')
+    parser.add_argument('--puzzle', '-p', type=int, default=None,
+                        help='chi so puzzle trong file corpus (mac dinh 0)')
+    parser.add_argument('--corpus', '-c', type=str, default=None,
+                        help='file corpus dung cho benchmark thay cho thu muc Inputs')
+    parser.add_argument('--sparse', action='store_true',
+                        help='doc file theo che do thua (board rat lon, it dao)')
+    parser.add_argument('--encoding', '-e', type=str, default=MA_HOA_MAC_DINH,
+                        choices=TEN_MA_HOA,
+                        help='cach ma hoa rang buoc so cau cua dao (pysat, astar)')
+    parser.add_argument('--connectivity', type=str, default='cut', choices=CAC_CACH_LIEN_THONG,
+                        help='pysat: them menh de cat theo thanh phan (cut) hay chan tung model (block)')
+    parser.add_argument('--sat-backend', type=str, default=BACKEND_MAC_DINH, choices=CAC_BACKEND,
+                        help='SAT solver cua PySAT dung cho pysat')
+    parser.add_argument('--astar-mode', type=str, default='astar', choices=CAC_CHE_DO,
+                        help='astar: A* day du; ida: IDA* (bo nho tuyen tinh); sma: SMA* (gioi han so node); '
+                             'hda: HDA* (song song nhieu tien trinh)')
+    parser.add_argument('--sma-max-nodes', type=int, default=GIOI_HAN_BO_NHO_MAC_DINH,
+                        help='so node toi da SMA* duoc luu')
+    parser.add_argument('--astar-workers', type=int, default=None,
+                        help='so tien trinh cho --astar-mode hda (mac dinh: so core)')
+    parser.add_argument('--sat-timeout', type=float, default=None,
+                        help='pysat: gioi han thoi gian (giay), het gio thi ngat solver')
+    parser.add_argument('--conf-budget', type=int, default=None,
+                        help='pysat: gioi han tong so conflict (vuot thi bao unknown)')
+    parser.add_argument('--prop-budget', type=int, default=None,
+                        help='pysat: gioi han tong so propagation (vuot thi bao unknown)')
+    parser.add_argument('--sat-benchmark', action='store_true',
+                        help='chay pysat voi moi backend tren Inputs (hoac --corpus), luu results_sat_backend.json')
+    parser.add_argument('--no-deduction', action='store_true',
+                        help='bo buoc suy luan co dinh cau truoc khi sinh CNF (pysat, astar)')
+    parser.add_argument('--count-solutions', type=int, default=None, metavar='LIMIT',
+                        help='dem so loi giai cua file input, dung o LIMIT (2 = kiem tra duy nhat, 0 = dem het)')
+    parser.add_argument('--export-dimacs', type=str, default=None, metavar='FILE',
+                        help='ghi CNF cua file input ra DIMACS (- = stdout) de giai bang SAT solver ngoai')
+    parser.add_argument('--import-model', type=str, default=None, metavar='FILE',
+                        help='doc model cua SAT solver ngoai, giai ma theo bang bien trong --dimacs')
+    parser.add_argument('--dimacs', type=str, default=None, metavar='FILE',
+                        help='file DIMACS da xuat (chua bang bien) dung cho --import-model')
+    parser.add_argument('--encoding-report', action='store_true',
+                        help='in so bien/menh de cua tung cach ma hoa cho file input')
+    parser.add_argument('--cnf-cache', type=str, default=None,
+                        help='thu muc cache CNF (mac dinh: bien moi truong HASHI_CNF_CACHE)')
+    parser.add_argument('--cnf-cache-mb', type=int, default=256,
+                        help='dung luong toi da cua cache CNF (MB)')
     parser.add_argument('--algorithm', '-a', type=str, default='pysat',
-                        choices=['pysat', 'astar', 'bruteforce', 'backtracking'],
+                        choices=list(CAC_SOLVER),
                         help='thuat toan')
+    parser.add_argument('--portfolio', type=str, default=','.join(THANH_VIEN_MAC_DINH),
+                        help='cac thuat toan chay song song khi --algorithm portfolio (%s)' % ', '.join(CAC_THANH_VIEN))
     parser.add_argument('--output', '-o', type=str, help='file output')
     parser.add_argument('--benchmark', '-b', action='store_true', help='chay benchmark')
     parser.add_argument('--quiet', '-q', action='store_true', help='im lang')
     
     args = parser.parse_args()
     
+    if args.cnf_cache:
+        set_default_cache(CNFCache(args.cnf_cache, args.cnf_cache_mb * 1024 * 1024))
+    
+    tham_so = {}
+    if args.algorithm in ('pysat', 'astar'):
+        tham_so['encoding'] = args.encoding
+        tham_so['deduction'] = not args.no_deduction
+    if args.algorithm == 'astar':
+        tham_so['mode'] = args.astar_mode
+        tham_so['gioi_han_bo_nho'] = args.sma_max_nodes
+        tham_so['so_worker'] = args.astar_workers
+    if args.algorithm == 'pysat':
+        tham_so['connectivity'] = args.connectivity
+        tham_so['backend'] = args.sat_backend
+        tham_so['gioi_han_tg'] = args.sat_timeout
+        tham_so['conf_budget'] = args.conf_budget
+        tham_so['prop_budget'] = args.prop_budget
+    if args.algorithm == 'portfolio':
+        tham_so['algos'] = [ten.strip() for ten in args.portfolio.split(',') if ten.strip()]
+    
     if args.benchmark:
-        chay_benchmark()
+        chay_benchmark(file_corpus=args.corpus)
+    elif args.sat_benchmark:
+        chay_benchmark_sat(file_corpus=args.corpus)
+    elif args.input and args.count_solutions is not None:
+        puzzle = doc_puzzle(args.input, args.puzzle, args.sparse)[0]
+        gioi_han = args.count_solutions or None
+        try:
+            so = count_solutions(puzzle, gioi_han, encoding=args.encoding, backend=args.sat_backend,
+                                 deduction=not args.no_deduction, gioi_han_tg=args.sat_timeout,
+                                 conf_budget=args.conf_budget, prop_budget=args.prop_budget)
+        except SolveLimitReached as loi:
+            print("Het gioi han thoi gian / ngan sach: da dem duoc %d loi giai, chua biet con nua ko" % loi.so_loi_giai)
+        else:
+            print("So loi giai: %d%s" % (so, " (da dat gioi han)" if gioi_han is not None and so >= gioi_han else ""))
+    elif args.input and args.export_dimacs:
+        puzzle = doc_puzzle(args.input, args.puzzle, args.sparse)[0]
+        hashi = build_cnf(puzzle, encoding=args.encoding, deduction=not args.no_deduction)
+        so = write_dimacs(hashi, args.export_dimacs)
+        if args.export_dimacs != '-':
+            print("Da ghi %d menh de, %d bien: %s" % (so, hashi.cnf.nv, args.export_dimacs))
+    elif args.input and args.import_model:
+        if not args.dimacs:
+            parser.error('--import-model can --dimacs')
+        puzzle = doc_puzzle(args.input, args.puzzle, args.sparse)[0]
+        loi_giai = load_model(args.import_model, puzzle, read_var_map(args.dimacs))
+        if loi_giai is None:
+            print("Model: UNSAT")
+        else:
+            print_output(puzzle.state_to_output(loi_giai))
+            print("Hop le:", puzzle.is_solution(loi_giai))
+    elif args.input and args.encoding_report:
+        in_bao_cao_ma_hoa(doc_puzzle(args.input, args.puzzle, args.sparse)[0])
     elif args.input:
         in_ra = not args.quiet
-        giai_puzzle(args.input, args.algorithm, args.output, in_ra)
+        giai_puzzle(args.input, args.algorithm, args.output, in_ra, chi_so=args.puzzle, thua=args.sparse,
+                    tham_so=tham_so)
     else:
         parser.print_help()
 
@@ -0,0 +1,107 @@
+import multiprocessing as mp
+import queue
+import time
+
+from sat_solver import solve_sat
+from astar_to_solve_cnf import solve_astar
+from domain_astar import solve_domain_astar
+from brute_force_solver import solve_bruteforce
+from backtracking_solver import solve_backtracking
+
+
+# cac thuat toan co the dua vao portfolio
+CAC_THANH_VIEN = {
+    'pysat': solve_sat,
+    'astar': solve_astar,
+    'astar-domain': solve_domain_astar,
+    'backtracking': solve_backtracking,
+    'bruteforce': solve_bruteforce,
+}
+THANH_VIEN_MAC_DINH = ('pysat', 'astar', 'backtracking')
+
+
+def _chay(ten, puzzle, hang_doi):
+    # chay trong tien trinh con, luon gui lai 1 ket qua (ke ca khi loi)
+    try:
+        loi_giai, tg, thong_ke = CAC_THANH_VIEN[ten](puzzle)
+        hang_doi.put((ten, loi_giai, tg, thong_ke, None))
+    except Exception as loi:
+        hang_doi.put((ten, None, 0, {}, str(loi)))
+
+
+class PortfolioSolver:
+    # chay nhieu thuat toan song song tren cung puzzle, lay loi giai hop le
+    # dau tien roi kill cac tien trinh con lai
+
+    def __init__(self, puzzle, algos=THANH_VIEN_MAC_DINH, gioi_han_tg=None):
+        for ten in algos:
+            if ten not in CAC_THANH_VIEN:
+                raise ValueError("ko biet thuat toan: %s (chon: %s)" % (ten, ', '.join(CAC_THANH_VIEN)))
+        self.puzzle = puzzle
+        self.algos = list(algos)
+        self.gioi_han_tg = gioi_han_tg
+        self.tg_chay = 0
+        self.thong_ke = {}
+
+    def solve(self):
+        t1 = time.time()
+        hang_doi = mp.Queue()
+        ds_tien_trinh = {}
+        for ten in self.algos:
+            p = mp.Process(target=_chay, args=(ten, self.puzzle, hang_doi), daemon=True)
+            p.start()
+            ds_tien_trinh[ten] = p
+
+        self.thong_ke = {
+            'thanh_vien': self.algos,
+            'thang': None,
+            'thoi_gian_thang': None,
+            'ket_qua': {}
+        }
+        ket_qua = self.thong_ke['ket_qua']
+        loi_giai = None
+
+        try:
+            while len(ket_qua) < len(ds_tien_trinh):
+                if self.gioi_han_tg is not None and time.time() - t1 > self.gioi_han_tg:
+                    break
+                try:
+                    ten, state, tg, thong_ke, loi = hang_doi.get(timeout=0.05)
+                except queue.Empty:
+                    # tien trinh chet ma ko gui ket qua (vd het bo nho)
+                    for ten, p in ds_tien_trinh.items():
+                        if ten not in ket_qua and not p.is_alive() and p.exitcode not in (0, None):
+                            ket_qua[ten] = {'success': False, 'error': 'exitcode %d' % p.exitcode}
+                    continue
+
+                hop_le = state is not None and self.puzzle.is_solution(state)
+                ket_qua[ten] = {'success': hop_le, 'time': tg, 'stats': thong_ke}
+                if loi is not None:
+                    ket_qua[ten]['error'] = loi
+                if hop_le:
+                    loi_giai = state
+                    self.thong_ke['thang'] = ten
+                    self.thong_ke['thoi_gian_thang'] = time.time() - t1
+                    break
+        finally:
+            # dung ngay cac tien trinh con lai
+            for p in ds_tien_trinh.values():
+                if p.is_alive():
+                    p.kill()
+            for p in ds_tien_trinh.values():
+                p.join()
+            hang_doi.close()
+
+        self.tg_chay = time.time() - t1
+        return loi_giai
+
+    def get_stats(self):
+        kq = dict(self.thong_ke)
+        kq["time"] = self.tg_chay
+        return kq
+
+
+def solve_portfolio(puzzle, algos=THANH_VIEN_MAC_DINH, gioi_han_tg=None):
+    solver = PortfolioSolver(puzzle, algos, gioi_han_tg)
+    kq = solver.solve()
+    return kq, solver.tg_chay, solver.get_stats()
@@ -0,0 +1,349 @@
+from array import array
+from bisect import bisect_right, insort
+try:
+    import numpy as np
+    _NUMPY_AVAILABLE = True
+except Exception:
+    np = None
+    _NUMPY_AVAILABLE = False
+
+# tu kich thuoc nay tro len thi dung NumPy (neu co) de tim hang xom
+NUMPY_MIN_CELLS = 100 * 100
+
+MASK64 = (1 << 64) - 1
+
+
+def splitmix64(x):
+    # tron 1 so nguyen thanh gia tri 64-bit gan ngau nhien, co dinh
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+def zobrist_key(r1, c1, r2, c2, so_cau):
+    # khoa Zobrist 64-bit co dinh cho (cau, so cau), tron theo kieu splitmix64
+    # nen ko can bang so ngau nhien va 2 tien trinh luon ra cung gia tri.
+    # Toa do (16 bit moi so) dung du 64 bit, so cau tron o vong thu 2 nen ko
+    # gioi han so bit (add_bridge co the cong don qua 3)
+    return splitmix64(splitmix64(((r1 << 16 | c1) << 16 | r2) << 16 | c2) + so_cau)
+
+
+def doc_dao_tu_file(duong_dan, kich_thuoc):
+    # doc file input tung dong, chi tra ve (r, c, val) cua cac dao va kiem tra
+    # dinh dang ngay trong lan doc do; kich_thuoc = [rows, cols] duoc ghi khi doc
+    so_cot = None
+    r = 0
+    with open(duong_dan, 'r') as f:
+        for so_dong, dong in enumerate(f, 1):
+            dong = dong.strip()
+            if not dong:
+                continue
+            
+            parts = dong.replace(' ', '').split(',')
+            if so_cot is None:
+                so_cot = len(parts)
+            elif len(parts) != so_cot:
+                raise ValueError("dong %d: co %d cot, can %d" % (so_dong, len(parts), so_cot))
+            
+            # chi doi sang so cac o khac '0' (dao hoac gia tri loi)
+            for c in [c for c, p in enumerate(parts) if p != '0']:
+                val = int(parts[c])
+                if val == 0:
+                    continue
+                if val < 0 or val > 8:
+                    raise ValueError("dong %d: gia tri %d ngoai [0, 8]" % (so_dong, val))
+                yield r, c, val
+            
+            r += 1
+            kich_thuoc[0] = r
+            kich_thuoc[1] = so_cot
+
+
+class PuzzleIndex:
+    # chi so dung chung cho moi solver, tinh 1 lan cho moi puzzle
+    # dao duoc danh so nguyen 0..I-1 theo thu tu hang roi cot
+    # cau tiem nang la cac dong trong bang phang (array), danh so 0..B-1
+
+    def __init__(self, rows, cols, ds_dao=None):
+        # ds_dao: cac bo (r, c, val) theo thu tu hang roi cot
+        # (None: bang rong, duong NumPy tu nap sau)
+        self.rows = rows
+        self.cols = cols
+
+        # bang dao
+        self.island_row = array('i')
+        self.island_col = array('i')
+        self.island_value = array('b')
+        self.id_map = {}
+
+        # bang cau: 2 dau (u < v), huong, hang/cot co dinh va khoang [lo, hi]
+        self.bridge_u = array('i')
+        self.bridge_v = array('i')
+        self.bridge_horizontal = array('b')
+        self.bridge_line = array('i')
+        self.bridge_lo = array('i')
+        self.bridge_hi = array('i')
+        self.bridge_map = {}
+
+        # ds cau ke voi moi dao, tang dan theo id cau
+        self.incident = []
+
+        # ds id cac cau cat ngang qua moi cau
+        self.conflicts = []
+
+        self._zobrist = None
+
+        if ds_dao is not None:
+            self._tao_cau(*self._doc_dao(ds_dao))
+            self._quet_giao_cat()
+
+    def _doc_dao(self, ds_dao):
+        # 1 lan duyet: dao truoc do tren cung hang la hang xom trai,
+        # dao cuoi cung da gap tren cung cot la hang xom tren
+        trai_cung_hang = -1
+        hang_ht = -1
+        cuoi_cot = {}
+        ben_phai = []
+        ben_duoi = []
+
+        for r, c, val in ds_dao:
+            i = len(self.island_row)
+            self.island_row.append(r)
+            self.island_col.append(c)
+            self.island_value.append(val)
+            self.id_map[(r, c)] = i
+            ben_phai.append(-1)
+            ben_duoi.append(-1)
+
+            if r != hang_ht:
+                hang_ht = r
+                trai_cung_hang = -1
+            if trai_cung_hang >= 0:
+                ben_phai[trai_cung_hang] = i
+            trai_cung_hang = i
+
+            tren = cuoi_cot.get(c, -1)
+            if tren >= 0:
+                ben_duoi[tren] = i
+            cuoi_cot[c] = i
+
+        return ben_phai, ben_duoi
+
+    def _tao_cau(self, ben_phai, ben_duoi):
+        # danh so cau theo tung dao: cau sang phai truoc, cau xuong duoi sau
+        n = len(self.island_row)
+        tren = [-1] * n
+        duoi = [-1] * n
+        trai = [-1] * n
+        phai = [-1] * n
+
+        for u in range(n):
+            v = ben_phai[u]
+            if v >= 0:
+                b = self._them_cau(u, v, 1, self.island_row[u],
+                                   self.island_col[u], self.island_col[v])
+                phai[u] = b
+                trai[v] = b
+
+            v = ben_duoi[u]
+            if v >= 0:
+                b = self._them_cau(u, v, 0, self.island_col[u],
+                                   self.island_row[u], self.island_row[v])
+                duoi[u] = b
+                tren[v] = b
+
+        # id cau tang dan: tren, trai (dao u dung truoc), roi phai, duoi
+        for i in range(n):
+            ds = []
+            for b in (tren[i], trai[i], phai[i], duoi[i]):
+                if b >= 0:
+                    ds.append(b)
+            self.incident.append(ds)
+
+    def _them_cau(self, u, v, ngang, line, lo, hi):
+        b = len(self.bridge_u)
+        self.bridge_u.append(u)
+        self.bridge_v.append(v)
+        self.bridge_horizontal.append(ngang)
+        self.bridge_line.append(line)
+        self.bridge_lo.append(lo)
+        self.bridge_hi.append(hi)
+        self.bridge_map[(u, v)] = b
+        return b
+
+    def _quet_giao_cat(self):
+        # quet theo cot: cau ngang dang "mo" tai cot c neu lo < c < hi,
+        # giu cac hang dang mo trong ds da sap xep de tra cuu bang bisect
+        so_cau = self.num_bridges
+        self.conflicts = [[] for _ in range(so_cau)]
+
+        mo = {}
+        dong = {}
+        doc = {}
+        for b in range(so_cau):
+            if self.bridge_horizontal[b]:
+                if self.bridge_hi[b] - self.bridge_lo[b] > 1:
+                    mo.setdefault(self.bridge_lo[b] + 1, []).append(b)
+                    dong.setdefault(self.bridge_hi[b], []).append(b)
+            elif self.bridge_hi[b] - self.bridge_lo[b] > 1:
+                doc.setdefault(self.bridge_line[b], []).append(b)
+
+        hang_mo = []
+        cau_o_hang = {}
+        for c in sorted(set(mo) | set(dong) | set(doc)):
+            for h in dong.get(c, ()):
+                r = self.bridge_line[h]
+                del hang_mo[bisect_right(hang_mo, r) - 1]
+                del cau_o_hang[r]
+            for h in mo.get(c, ()):
+                r = self.bridge_line[h]
+                insort(hang_mo, r)
+                cau_o_hang[r] = h
+
+            if not hang_mo:
+                continue
+            for v in doc.get(c, ()):
+                # cac hang nam giua 2 dau cau doc
+                i = bisect_right(hang_mo, self.bridge_lo[v])
+                while i < len(hang_mo) and hang_mo[i] < self.bridge_hi[v]:
+                    h = cau_o_hang[hang_mo[i]]
+                    self.conflicts[h].append(v)
+                    self.conflicts[v].append(h)
+                    i += 1
+
+        for ds in self.conflicts:
+            ds.sort()
+
+    def zobrist_table(self):
+        # bang khoa theo id cau: tab[3*b + n], n = 0 luon la 0; tinh 1 lan
+        if self._zobrist is None:
+            tab = [0] * (3 * self.num_bridges)
+            for b in range(self.num_bridges):
+                u, v = self.bridge_u[b], self.bridge_v[b]
+                toa_do = (self.island_row[u], self.island_col[u],
+                          self.island_row[v], self.island_col[v])
+                tab[3 * b + 1] = zobrist_key(*toa_do, 1)
+                tab[3 * b + 2] = zobrist_key(*toa_do, 2)
+            self._zobrist = tab
+        return self._zobrist
+
+    def components(self, counts):
+        # gan nhan thanh phan lien thong cho moi dao, chi theo cac cau co
+        # counts[b] > 0; tra ve (nhan, so thanh phan)
+        n = self.num_islands
+        nhan = [-1] * n
+        so_tp = 0
+        ke, bu, bv = self.incident, self.bridge_u, self.bridge_v
+        for goc in range(n):
+            if nhan[goc] >= 0:
+                continue
+            nhan[goc] = so_tp
+            stack = [goc]
+            while stack:
+                i = stack.pop()
+                for b in ke[i]:
+                    if counts[b] > 0:
+                        # other_end viet thang ra (goi rat nhieu lan)
+                        j = bu[b]
+                        if j == i:
+                            j = bv[b]
+                        if nhan[j] < 0:
+                            nhan[j] = so_tp
+                            stack.append(j)
+            so_tp += 1
+        return nhan, so_tp
+
+    @property
+    def num_islands(self):
+        return len(self.island_row)
+
+    @property
+    def num_bridges(self):
+        return len(self.bridge_u)
+
+    def bridge_id(self, u, v):
+        # tra ve id cau noi 2 dao u, v (hoac -1 neu ko co)
+        if u > v:
+            u, v = v, u
+        return self.bridge_map.get((u, v), -1)
+
+    def other_end(self, b, i):
+        if self.bridge_u[b] == i:
+            return self.bridge_v[b]
+        return self.bridge_u[b]
+
+    @staticmethod
+    def from_grid(grid):
+        rows = len(grid)
+        cols = len(grid[0]) if rows > 0 else 0
+        if _NUMPY_AVAILABLE and rows * cols >= NUMPY_MIN_CELLS:
+            return PuzzleIndex._from_grid_numpy(grid, rows, cols)
+        ds_dao = []
+        for r in range(rows):
+            hang = grid[r]
+            for c in range(cols):
+                if hang[c] > 0:
+                    ds_dao.append((r, c, hang[c]))
+        return PuzzleIndex(rows, cols, ds_dao)
+
+    @staticmethod
+    def from_file(duong_dan):
+        # che do thua: ko giu luoi day du, chi giu toa do dao
+        kich_thuoc = [0, 0]
+        idx = PuzzleIndex(0, 0, doc_dao_tu_file(duong_dan, kich_thuoc))
+        idx.rows, idx.cols = kich_thuoc
+        return idx
+
+    @staticmethod
+    def _from_grid_numpy(grid, rows, cols):
+        idx = PuzzleIndex(rows, cols)
+        idx._nap_numpy(np.asarray(grid, dtype=np.int16))
+        idx._quet_giao_cat()
+        return idx
+
+    def _nap_numpy(self, a):
+        # dao theo thu tu hang roi cot: 2 dao lien tiep cung hang la hang xom
+        # ngang; sap lai theo cot roi hang thi 2 dao lien tiep cung cot la
+        # hang xom doc. Ca bang cau duoc dung bang phep toan tren mang
+        rr, cc = np.nonzero(a)
+        n = len(rr)
+        self.island_row.frombytes(rr.astype(np.int32).tobytes())
+        self.island_col.frombytes(cc.astype(np.int32).tobytes())
+        self.island_value.frombytes(a[rr, cc].astype(np.int8).tobytes())
+        self.id_map = dict(zip(zip(rr.tolist(), cc.tolist()), range(n)))
+
+        u_phai = np.nonzero(rr[1:] == rr[:-1])[0]
+        theo_cot = np.lexsort((rr, cc))
+        k = np.nonzero(cc[theo_cot[1:]] == cc[theo_cot[:-1]])[0]
+        u_duoi, v_duoi = theo_cot[k], theo_cot[k + 1]
+
+        # cung thu tu voi duong Python: theo dao u, cau sang phai truoc
+        u = np.concatenate([u_phai, u_duoi])
+        v = np.concatenate([u_phai + 1, v_duoi])
+        ngang = np.concatenate([np.ones(len(u_phai), dtype=np.int8),
+                                np.zeros(len(u_duoi), dtype=np.int8)])
+        thu_tu = np.argsort(2 * u + 1 - ngang, kind='stable')
+        u, v, ngang = u[thu_tu], v[thu_tu], ngang[thu_tu]
+        so_cau = len(u)
+
+        la_ngang = ngang.astype(bool)
+        self.bridge_u.frombytes(u.astype(np.int32).tobytes())
+        self.bridge_v.frombytes(v.astype(np.int32).tobytes())
+        self.bridge_horizontal.frombytes(ngang.tobytes())
+        for bang, gia_tri in ((self.bridge_line, np.where(la_ngang, rr[u], cc[u])),
+                              (self.bridge_lo, np.where(la_ngang, cc[u], rr[u])),
+                              (self.bridge_hi, np.where(la_ngang, cc[v], rr[v]))):
+            bang.frombytes(gia_tri.astype(np.int32).tobytes())
+        self.bridge_map = dict(zip(zip(u.tolist(), v.tolist()), range(so_cau)))
+
+        # ds cau ke: sap (dao, id cau) roi cat theo so cau cua moi dao
+        dau = np.concatenate([u, v])
+        ids = np.concatenate([np.arange(so_cau), np.arange(so_cau)])
+        ids = ids[np.lexsort((ids, dau))].tolist()
+        moc = [0] + np.cumsum(np.bincount(dau, minlength=n)).tolist()
+        self.incident = [ids[moc[i]:moc[i + 1]] for i in range(n)]
+
+    def __repr__(self):
+        return "PuzzleIndex(%dx%d, %d dao, %d cau)" % (
+            self.rows, self.cols, self.num_islands, self.num_bridges)
@@ -1,111 +1,480 @@
-from pysat.solvers import Glucose3
-from hashiwokakero import Puzzle, PuzzleState
-from cnf_generator import HashiCNF
+import threading
 import time
 
+from pysat.solvers import Solver
+from hashiwokakero import Puzzle, PuzzleState
+from cnf_cache import build_cnf
+from cnf_generator import HashiCNF, MA_HOA_MAC_DINH
+
+
+# cach xu ly khi model ko lien thong:
+# 'cut': voi moi thanh phan, them menh de "phai co it nhat 1 cau noi ra ngoai"
+# 'block': chan dung model do (chi tren bien cau), cach cu
+CAC_CACH_LIEN_THONG = ('cut', 'block')
+
+# cac SAT solver cua PySAT co the dung lam backend
+CAC_BACKEND = ('glucose3', 'glucose4', 'glucose42', 'cadical153', 'cadical195',
+               'maplechrono', 'maplesat', 'lingeling', 'minisat22')
+BACKEND_MAC_DINH = 'glucose3'
+
+_backend_co_san = None
+
+
+class SolveLimitReached(RuntimeError):
+    # enumerate dung vi het ngan sach / bi ngat: so loi giai dem duoc chi la
+    # can duoi, ko phai ket qua chinh xac
+    def __init__(self, so_loi_giai):
+        super().__init__("het gioi han sau %d loi giai, chua biet con loi giai khac ko" % so_loi_giai)
+        self.so_loi_giai = so_loi_giai
+
+
+def backend_co_san():
+    # cac backend thuc su tao duoc (tuy ban PySAT da build)
+    global _backend_co_san
+    if _backend_co_san is None:
+        _backend_co_san = []
+        for ten in CAC_BACKEND:
+            try:
+                Solver(name=ten).delete()
+            except Exception:
+                continue
+            _backend_co_san.append(ten)
+    return list(_backend_co_san)
+
 
 class SATSolver:
     
-    def __init__(self, puzzle):
+    def __init__(self, puzzle, cache=None, encoding=MA_HOA_MAC_DINH, connectivity='cut',
+                 backend=BACKEND_MAC_DINH, deduction=True, gioi_han_tg=None,
+                 conf_budget=None, prop_budget=None):
+        if connectivity not in CAC_CACH_LIEN_THONG:
+            raise ValueError("connectivity phai la mot trong %s" % (CAC_CACH_LIEN_THONG,))
+        if backend not in CAC_BACKEND:
+            raise ValueError("backend phai la mot trong %s" % (CAC_BACKEND,))
         self.puzzle = puzzle
+        self.cache = cache
+        self.encoding = encoding
+        self.connectivity = connectivity
+        self.backend = backend
+        self.deduction = deduction
+        # gioi han: thoi gian thuc (giay, ngat bang interrupt) va so
+        # conflict / propagation tong cong; None = ko gioi han
+        self.gioi_han_tg = gioi_han_tg
+        self.conf_budget = conf_budget
+        self.prop_budget = prop_budget
+        # so lieu solver luc bat dau lan giai hien tai (moc tinh ngan sach)
+        self._moc_tk = {}
         self.tg_chay = 0
         self.thong_ke = {}
     
-    def solve(self):
+    def _chuan_bi(self):
+        # sinh CNF (hoac lay tu cache) va tao solver; solver = None neu CNF
+        # co menh de rong (vd dao can nhieu cau hon so cho) -> vo nghiem
         t1 = time.time()
-        
-        hashi = HashiCNF(self.puzzle.grid)
-        cnf = hashi.generate_cnf()
+        hashi = build_cnf(self.puzzle, self.cache, self.encoding, self.deduction)
+        cnf = hashi.cnf
+        tg_ma_hoa = time.time() - t1
         
         self.thong_ke = {
-            'so_dao': len(hashi.islands),
-            'so_cau_tiem_nang': len(hashi.bridges),
+            'so_dao': hashi.index.num_islands,
+            'so_cau_tiem_nang': hashi.index.num_bridges,
+            'so_cau_co_dinh': sum(1 for n in hashi.co_dinh if n >= 0),
             'so_bien': cnf.nv,
-            'so_menh_de': len(cnf.clauses)
+            'so_menh_de': len(cnf.clauses),
+            'ma_hoa': self.encoding,
+            'bao_cao_ma_hoa': hashi.get_report(),
+            'lien_thong': self.connectivity,
+            'backend': self.backend,
+            'so_lan_giai_lai': 0,
+            'so_menh_de_lien_thong': 0
         }
+        self._dat_lai_thoi_gian()
+        self.thong_ke['tg_ma_hoa'] = tg_ma_hoa
         
-        solver = Glucose3()
-        for menh_de in cnf.clauses:
-            if len(menh_de) > 0:
-                solver.add_clause(menh_de)
+        if any(len(menh_de) == 0 for menh_de in cnf.clauses):
+            return hashi, None
+        # nap ca CNF 1 lan thay vi add_clause tung menh de; CNF rong (moi cau
+        # da co dinh) thi nap 1 menh de luon dung vi maplesat crash khi giai
+        # CNF ko co menh de
+        return hashi, Solver(name=self.backend, bootstrap_with=cnf.clauses or [[1, -1]])
+    
+    def _dat_lai_thoi_gian(self):
+        # thoi gian tung buoc: sinh CNF, goi SAT, giai ma, sua lien thong
+        self.thong_ke.update({
+            'trang_thai': 'unsat',
+            'tg_ma_hoa': 0.0,
+            'tg_giai': 0.0,
+            'tg_giai_ma': 0.0,
+            'tg_lien_thong': 0.0
+        })
+    
+    def _bat_hen_gio(self, solver):
+        # ngat solver tu luong hen gio khi het gioi_han_tg
+        if self.gioi_han_tg is None:
+            return None
+        def ngat():
+            try:
+                solver.interrupt()
+            except NotImplementedError:
+                # backend ko ho tro ngat (vd lingeling)
+                pass
         
-        if solver.solve():
-            model = solver.get_model()
-            state = self._giai_ma(model, hashi)
-            
-            # kiem tra lien thong, neu chua thi tim tiep
-            if not self.puzzle.is_connected(state):
-                state = self._tim_lien_thong(solver, hashi)
-            
-            self.tg_chay = time.time() - t1
+        hen_gio = threading.Timer(self.gioi_han_tg, ngat)
+        hen_gio.daemon = True
+        hen_gio.start()
+        return hen_gio
+    
+    def _giai(self, solver, gia_dinh=()):
+        # 1 lan goi SAT trong ngan sach con lai; tra ve True / False / None
+        # (None = het ngan sach hoac bi ngat, trang_thai = 'unknown')
+        t1 = time.time()
+        if self.gioi_han_tg is None and self.conf_budget is None and self.prop_budget is None:
+            kq = solver.solve(assumptions=gia_dinh)
+        else:
+            kq = self._giai_gioi_han(solver, gia_dinh)
+        self.thong_ke['tg_giai'] += time.time() - t1
+        
+        if kq is None:
+            self.thong_ke['trang_thai'] = 'unknown'
+        elif kq:
+            self.thong_ke['trang_thai'] = 'sat'
+        else:
+            self.thong_ke['trang_thai'] = 'unsat'
+        return kq
+    
+    def _con_lai(self, solver):
+        # ngan sach con lai tinh tren tong so conflict / propagation tu moc
+        tk = solver.accum_stats() or {}
+        moc = self._moc_tk
+        con_lai = []
+        if self.conf_budget is not None:
+            con_lai.append(('conf', self.conf_budget - tk.get('conflicts', 0) + moc.get('conflicts', 0)))
+        if self.prop_budget is not None:
+            con_lai.append(('prop', self.prop_budget - tk.get('propagations', 0) + moc.get('propagations', 0)))
+        return con_lai
+    
+    def _giai_gioi_han(self, solver, gia_dinh):
+        con_lai = self._con_lai(solver)
+        if any(n <= 0 for _, n in con_lai):
+            return None
+        
+        try:
+            for loai, n in con_lai:
+                if loai == 'conf':
+                    solver.conf_budget(n)
+                else:
+                    solver.prop_budget(n)
+            kq = solver.solve_limited(assumptions=gia_dinh,
+                                      expect_interrupt=self.gioi_han_tg is not None)
+        except NotImplementedError:
+            # backend ko ho tro ngan sach / ngat -> giai binh thuong
+            self.thong_ke['gioi_han_ho_tro'] = False
+            return solver.solve(assumptions=gia_dinh)
+        
+        # backend chi xet ngan sach giua cac lan restart nen co the vuot qua;
+        # vuot thi coi nhu het ngan sach du da ra ket qua
+        if any(n < 0 for _, n in self._con_lai(solver)):
+            return None
+        return kq
+    
+    def solve(self):
+        t1 = time.time()
+        
+        # lay CNF tu cache tren dia neu co, nguoc lai sinh moi
+        hashi, solver = self._chuan_bi()
+        
+        state = None
+        if solver is not None:
+            hen_gio = self._bat_hen_gio(solver)
+            try:
+                if self._giai(solver):
+                    # kiem tra lien thong, neu chua thi them rang buoc va giai tiep
+                    state = self._tim_lien_thong(solver, hashi)
+            finally:
+                if hen_gio is not None:
+                    hen_gio.cancel()
+            self._ghi_thong_ke_solver(solver)
             solver.delete()
-            return state
         
         self.tg_chay = time.time() - t1
-        solver.delete()
-        return None
+        return state
+    
+    def enumerate(self, limit=None):
+        # sinh lan luot cac loi giai (lien thong) khac nhau, chan tung loi giai
+        # tren bien cau (bien phu cua ma hoa ko lam trung loi giai)
+        t1 = time.time()
+        hashi, solver = self._chuan_bi()
+        self.thong_ke['so_loi_giai'] = 0
+        if solver is None:
+            return
+        
+        hen_gio = self._bat_hen_gio(solver)
+        try:
+            while limit is None or self.thong_ke['so_loi_giai'] < limit:
+                if not self._giai(solver):
+                    break
+                model = self._model_lien_thong(solver, hashi)
+                if model is None:
+                    break
+                self.thong_ke['so_loi_giai'] += 1
+                self.tg_chay = time.time() - t1
+                yield self._giai_ma(model, hashi)
+                
+                chan = [-lit for lit in model if abs(lit) in hashi.bien_cau]
+                if not chan:
+                    # moi cau da co dinh -> chi co 1 loi giai
+                    break
+                solver.add_clause(chan)
+            if self.thong_ke['trang_thai'] == 'unknown':
+                raise SolveLimitReached(self.thong_ke['so_loi_giai'])
+        finally:
+            if hen_gio is not None:
+                hen_gio.cancel()
+            self._ghi_thong_ke_solver(solver)
+            solver.delete()
+            self.tg_chay = time.time() - t1
+    
+    def _ghi_thong_ke_solver(self, solver):
+        # so conflict / propagation... do backend dem
+        tk = solver.accum_stats() or {}
+        for k in ('conflicts', 'decisions', 'propagations', 'restarts'):
+            self.thong_ke[k] = tk.get(k, 0)
     
     def _giai_ma(self, model, hashi):
-        # chuyen model SAT thanh PuzzleState
+        # chuyen model SAT thanh PuzzleState (gom ca cau da co dinh)
         state = PuzzleState()
-        tap_model = set(model)
+        dem = hashi.bridge_counts(set(model))
         
-        for b in hashi.bridges:
-            idx = b['idx']
-            v1 = hashi.var_pool[(idx, 1)]
-            v2 = hashi.var_pool[(idx, 2)]
-            
-            so_cau = 0
-            if v2 in tap_model:
-                so_cau = 2
-            elif v1 in tap_model:
-                so_cau = 1
-            
+        chi_so = hashi.index
+        for idx in range(chi_so.num_bridges):
+            so_cau = dem[idx]
             if so_cau > 0:
-                r1, c1 = b['u']['r'], b['u']['c']
-                r2, c2 = b['v']['r'], b['v']['c']
-                
-                dao1 = self.puzzle.island_map.get((r1, c1))
-                dao2 = self.puzzle.island_map.get((r2, c2))
-                
-                if dao1 and dao2:
-                    state.add_bridge(dao1, dao2, so_cau)
+                dao1 = self.puzzle.islands[chi_so.bridge_u[idx]]
+                dao2 = self.puzzle.islands[chi_so.bridge_v[idx]]
+                state.add_bridge(dao1, dao2, so_cau)
         
         return state
     
-    def _tim_lien_thong(self, solver, hashi):
-        # thu nhieu loi giai de tim cai lien thong
-        so_lan_thu = 1000
-        
-        for _ in range(so_lan_thu):
+    def _tim_lien_thong(self, solver, hashi, gia_dinh=()):
+        model = self._model_lien_thong(solver, hashi, gia_dinh)
+        if model is None:
+            return None
+        t1 = time.time()
+        state = self._giai_ma(model, hashi)
+        self.thong_ke['tg_giai_ma'] += time.time() - t1
+        return state
+    
+    def _model_lien_thong(self, solver, hashi, gia_dinh=()):
+        # giai lai tren cung solver (giu menh de hoc duoc) cho den khi model lien thong
+        # menh de cat / chan chi phu thuoc bang cau nen dung voi moi gia dinh
+        idx = hashi.index
+        while True:
+            t1 = time.time()
             model = solver.get_model()
-            if model is None:
-                return None
-            
-            state = self._giai_ma(model, hashi)
+            dem = hashi.bridge_counts(set(model))
+            nhan, so_tp = idx.components(dem)
             
-            if self.puzzle.is_connected(state):
-                return state
+            if so_tp <= 1:
+                self.thong_ke['tg_lien_thong'] += time.time() - t1
+                return model
             
-            # block loi giai hien tai va tim tiep
-            block_clause = []
-            for lit in model:
-                if abs(lit) <= len(hashi.var_pool):
-                    block_clause.append(-lit)
+            if self.connectivity == 'cut':
+                ds_menh_de = self._lat_cat(nhan, so_tp, hashi)
+            else:
+                # chan model hien tai, chi tren bien cau
+                ds_menh_de = [[-lit for lit in model if abs(lit) in hashi.bien_cau]]
+            self.thong_ke['tg_lien_thong'] += time.time() - t1
+            if ds_menh_de is None:
+                self.thong_ke['trang_thai'] = 'unsat'
+                return None
             
-            solver.add_clause(block_clause)
+            solver.append_formula(ds_menh_de)
+            self.thong_ke['so_menh_de_lien_thong'] += len(ds_menh_de)
+            self.thong_ke['so_lan_giai_lai'] += 1
             
-            if not solver.solve():
+            if not self._giai(solver, gia_dinh):
                 return None
+    
+    def _lat_cat(self, nhan, so_tp, hashi):
+        # moi thanh phan phai co it nhat 1 cau noi ra ngoai: OR cac bien1 cua cau
+        # co dung 1 dau trong thanh phan. Loai 1 ca ho model ko lien thong
+        # (cau co dinh ko co bien: neu > 0 thi da nam trong 1 thanh phan)
+        idx = hashi.index
+        bien = [[] for _ in range(so_tp)]
+        for b in range(idx.num_bridges):
+            tu, den = nhan[idx.bridge_u[b]], nhan[idx.bridge_v[b]]
+            if tu != den and hashi.bien1[b]:
+                bien[tu].append(hashi.bien1[b])
+                bien[den].append(hashi.bien1[b])
         
-        return None
+        ds = []
+        da_co = set()
+        for cl in bien:
+            if not cl:
+                # thanh phan ko the noi ra ngoai -> vo nghiem
+                return None
+            k = tuple(sorted(cl))
+            if k not in da_co:
+                da_co.add(k)
+                ds.append(cl)
+        return ds
     
     def get_stats(self):
         kq = dict(self.thong_ke)
         kq["time"] = self.tg_chay
         return kq
 
-def solve_sat(puzzle):
-    solver = SATSolver(puzzle)
+class IncrementalHashiSession(SATSolver):
+    # phien giai lau dai cho editor: sua gia tri dao / co dinh cau roi giai lai
+    # tren cung 1 solver. Rang buoc so cau cua dao (dao, val) duoc bat bang
+    # bien chon s: moi menh de them -s, va s duoc dua vao assumptions.
+    # Cau co dinh cung chi la assumptions tren bien cau, nen moi lan sua chi
+    # doi assumptions, solver giu nguyen menh de hoc duoc va menh de cat
+
+    def __init__(self, puzzle, encoding=MA_HOA_MAC_DINH, connectivity='cut',
+                 backend=BACKEND_MAC_DINH, gioi_han_tg=None, conf_budget=None, prop_budget=None):
+        super().__init__(puzzle, None, encoding, connectivity, backend, False,
+                         gioi_han_tg, conf_budget, prop_budget)
+        self.hashi = HashiCNF(puzzle.grid, puzzle.index, encoding)
+        self.top = self.hashi.top
+        # gia tri hien tai cua moi dao, bien chon theo (dao, val)
+        self.gia_tri = list(puzzle.index.island_value)
+        self.bien_chon = {}
+        # id cau -> so cau co dinh
+        self.co_dinh = {}
+
+        self.solver = Solver(name=backend, bootstrap_with=self.hashi.bridge_clauses())
+        self.thong_ke = {
+            'so_dao': puzzle.index.num_islands,
+            'so_cau_tiem_nang': puzzle.index.num_bridges,
+            'ma_hoa': encoding,
+            'lien_thong': connectivity,
+            'backend': backend,
+            'so_lan_giai': 0,
+            'so_menh_de_dao': 0,
+            'so_lan_giai_lai': 0,
+            'so_menh_de_lien_thong': 0
+        }
+        self._dat_lai_thoi_gian()
+
+    def _dao(self, r, c):
+        dao = self.puzzle.index.id_map.get((r, c))
+        if dao is None:
+            raise ValueError("ko co dao tai (%d, %d)" % (r, c))
+        return dao
+
+    def _cau(self, r1, c1, r2, c2):
+        u, v = sorted((self._dao(r1, c1), self._dao(r2, c2)))
+        b = self.puzzle.index.bridge_id(u, v)
+        if b < 0:
+            raise ValueError("ko the noi (%d, %d) - (%d, %d)" % (r1, c1, r2, c2))
+        return b
+
+    def _lay_bien_chon(self, dao, val):
+        # sinh menh de cho (dao, val) lan dau can den, gan them bien chon
+        khoa = (dao, val)
+        s = self.bien_chon.get(khoa)
+        if s is None:
+            menh_de, self.top = self.hashi.island_clauses(dao, val, self.top)
+            self.top += 1
+            s = self.top
+            self.solver.append_formula([[-s] + cl for cl in menh_de])
+            self.bien_chon[khoa] = s
+            self.thong_ke['so_menh_de_dao'] += len(menh_de)
+        return s
+
+    def set_island_value(self, r, c, val):
+        if not 1 <= val <= 8:
+            raise ValueError("gia tri dao phai tu 1 den 8")
+        dao = self._dao(r, c)
+        self.gia_tri[dao] = val
+        # sua ca puzzle de state tra ve duoc kiem tra / in theo gia tri moi
+        self.puzzle.islands[dao].value = val
+        self.puzzle.index.island_value[dao] = val
+
+    def fix_bridge(self, r1, c1, r2, c2, so_cau):
+        if so_cau not in (0, 1, 2):
+            raise ValueError("so cau phai la 0, 1 hoac 2")
+        self.co_dinh[self._cau(r1, c1, r2, c2)] = so_cau
+
+    def release_bridge(self, r1, c1, r2, c2):
+        self.co_dinh.pop(self._cau(r1, c1, r2, c2), None)
+
+    def assumptions(self):
+        gia_dinh = [self._lay_bien_chon(dao, val) for dao, val in enumerate(self.gia_tri)]
+        for b, so_cau in sorted(self.co_dinh.items()):
+            v1, v2 = self.hashi.bien1[b], self.hashi.bien2[b]
+            if so_cau == 0:
+                gia_dinh.append(-v1)
+            elif so_cau == 1:
+                gia_dinh.extend((v1, -v2))
+            else:
+                gia_dinh.append(v2)
+        return gia_dinh
+
+    def solve(self):
+        t1 = time.time()
+        # trang thai / thoi gian tung buoc tinh rieng cho moi lan giai lai
+        self._dat_lai_thoi_gian()
+        gia_dinh = self.assumptions()
+        self.thong_ke['so_lan_giai'] += 1
+
+        # ngan sach tinh cho moi lan giai lai
+        self.solver.clear_interrupt()
+        self._moc_tk = self.solver.accum_stats() or {}
+        state = None
+        hen_gio = self._bat_hen_gio(self.solver)
+        try:
+            if self._giai(self.solver, gia_dinh):
+                state = self._tim_lien_thong(self.solver, self.hashi, gia_dinh)
+        finally:
+            if hen_gio is not None:
+                hen_gio.cancel()
+
+        self.thong_ke['so_bien'] = self.top
+        self._ghi_thong_ke_solver(self.solver)
+        self.tg_chay = time.time() - t1
+        return state
+
+    def close(self):
+        if self.solver is not None:
+            self.solver.delete()
+            self.solver = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def solve_sat(puzzle, cache=None, encoding=MA_HOA_MAC_DINH, connectivity='cut',
+              backend=BACKEND_MAC_DINH, deduction=True, gioi_han_tg=None,
+              conf_budget=None, prop_budget=None):
+    solver = SATSolver(puzzle, cache, encoding, connectivity, backend, deduction,
+                       gioi_han_tg, conf_budget, prop_budget)
     kq = solver.solve()
     return kq, solver.tg_chay, solver.get_stats()
+
+
+def enumerate_solutions(puzzle, limit=None, cache=None, encoding=MA_HOA_MAC_DINH,
+                        backend=BACKEND_MAC_DINH, deduction=True, gioi_han_tg=None,
+                        conf_budget=None, prop_budget=None):
+    # generator: ko giu cac loi giai da sinh trong bo nho; het gioi han giua
+    # chung thi raise SolveLimitReached (sau cac loi giai da sinh)
+    solver = SATSolver(puzzle, cache, encoding, 'cut', backend, deduction,
+                       gioi_han_tg, conf_budget, prop_budget)
+    yield from solver.enumerate(limit)
+
+
+def count_solutions(puzzle, limit=None, **tham_so):
+    # dem so loi giai, dung som khi dat limit (limit=2 de kiem tra duy nhat);
+    # het gioi han truoc khi biet chac -> SolveLimitReached (.so_loi_giai)
+    dem = 0
+    for _ in enumerate_solutions(puzzle, limit, **tham_so):
+        dem += 1
+    return dem
+
+
+def is_unique(puzzle, **tham_so):
+    return count_solutions(puzzle, 2, **tham_so) == 1
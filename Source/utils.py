@@ -1,4 +1,5 @@
 from hashiwokakero import Puzzle, PuzzleState
+from puzzle_index import doc_dao_tu_file
 import os
 import time
 import tracemalloc
@@ -18,6 +19,10 @@ def save_output(grid, duong_dan):
 
 def print_puzzle(puzzle):
     print("Puzzle: %dx%d, %d dao" % (puzzle.rows, puzzle.cols, len(puzzle.islands)))
+    if puzzle.grid is None:
+        # che do thua, ko in luoi
+        print()
+        return
     for row in puzzle.grid:
         dong = ""
         for val in row:
@@ -138,32 +143,12 @@ def make_table(tat_ca_kq):
 
 
 def check_input_file(duong_dan):
-    # kiem tra file input
+    # kiem tra file input, doc tung dong trong 1 lan duyet
     try:
-        with open(duong_dan, 'r') as f:
-            ds_dong = f.readlines()
-        
-        if len(ds_dong) == 0:
-            return False
-        
-        so_cot = None
-        for dong in ds_dong:
-            dong = dong.strip()
-            if not dong:
-                continue
-            
-            parts = dong.split(',')
-            for p in parts:
-                val = int(p.strip())
-                if val < 0 or val > 8:
-                    return False
-            
-            if so_cot is None:
-                so_cot = len(parts)
-            elif len(parts) != so_cot:
-                return False
-        
-        return True
+        kich_thuoc = [0, 0]
+        for _ in doc_dao_tu_file(duong_dan, kich_thuoc):
+            pass
+        return kich_thuoc[0] > 0
     except:
         return False
 